@@ -0,0 +1,149 @@
+"""Reconstrói as camadas bronze, silver e gold reparseando todas as páginas arquivadas.
+
+Útil depois de corrigir um parser em webscraper_editais.py: as páginas guardadas em
+data/html_archive/ são reparseadas em paralelo (um processo por núcleo) com o parser
+atual e o resultado substitui as camadas existentes.
+
+A saída é determinística: para o mesmo arquivo e a mesma --data-referencia, os
+Parquets gerados têm o mesmo conteúdo.
+
+Uso:
+    python backfill_editais.py [--workers N] [--data-referencia AAAA-MM-DD]
+"""
+
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+import webscraper_editais
+import tratamento_dados
+
+# logger
+logger = logging.getLogger(__name__)
+
+# Intervalo mínimo, em segundos, entre mensagens de progresso
+PROGRESS_INTERVAL = 5
+
+
+def _parsear(item):
+    """Reparseia um snapshot; erros são devolvidos em vez de levantados, para não abortar o map.
+
+    Returns:
+        tuple: (registros, tamanho em bytes, mensagem de erro ou None).
+    """
+    fonte_nome, sha = item
+    try:
+        linhas, tamanho = webscraper_editais.parsear_snapshot(fonte_nome, sha)
+        return linhas, tamanho, None
+    except Exception as e:
+        return [], 0, f"{type(e).__name__}: {e}"
+
+
+def listar_snapshots():
+    """Agrupa o índice por conteúdo: cada página única é parseada uma única vez.
+
+    Returns:
+        list[tuple]: (fonte, sha256, última coleta) ordenados por última coleta e sha.
+    """
+    ultima_coleta = {}
+    fontes_conhecidas = {f.nome for f in webscraper_editais.FONTES}
+    for entrada in webscraper_editais.carregar_indice_arquivo():
+        chave = (entrada['fonte'], entrada['sha256'])
+        if entrada['fonte'] not in fontes_conhecidas:
+            continue
+        ultima_coleta[chave] = max(ultima_coleta.get(chave, ''), entrada['coletado_em'])
+    return sorted(((fonte, sha, coleta) for (fonte, sha), coleta in ultima_coleta.items()),
+                  key=lambda s: (s[2], s[1]))
+
+
+def reparsear_arquivo(snapshots, workers=None):
+    """Reparseia os snapshots em paralelo, registrando progresso e vazão.
+
+    Returns:
+        pandas.DataFrame: Registros de todos os snapshots, na ordem de `snapshots`.
+    """
+    total = len(snapshots)
+    registros = []
+    bytes_lidos = 0
+    vazios = 0
+    falhas = 0
+    inicio = time.monotonic()
+    ultimo_log = inicio
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        itens = [(fonte, sha) for fonte, sha, _ in snapshots]
+        # map preserva a ordem de entrada, o que mantém a saída determinística
+        resultados = executor.map(_parsear, itens, chunksize=max(1, total // (4 * (workers or os.cpu_count() or 1))))
+        for feitos, ((fonte, sha, coletado_em), (linhas, tamanho, erro)) in enumerate(zip(snapshots, resultados), start=1):
+            bytes_lidos += tamanho
+            if erro is not None:
+                falhas += 1
+                logger.error(f"Falha ao reparsear {fonte}/{sha}: {erro}")
+            elif not linhas:
+                vazios += 1
+            for linha in linhas:
+                linha['coletado_em'] = coletado_em
+            registros.extend(linhas)
+
+            agora = time.monotonic()
+            if agora - ultimo_log >= PROGRESS_INTERVAL or feitos == total:
+                decorrido = max(agora - inicio, 1e-9)
+                logger.info(f"Progresso: {feitos}/{total} snapshots ({feitos / total:.0%}) | "
+                            f"{feitos / decorrido:.1f} páginas/s | {bytes_lidos / decorrido / 1e6:.2f} MB/s")
+                ultimo_log = agora
+
+    decorrido = time.monotonic() - inicio
+    logger.info(f"{total} snapshot(s) reparseado(s) em {decorrido:.1f}s "
+                f"({total / decorrido if decorrido else 0:.1f} páginas/s, {bytes_lidos / 1e6:.1f} MB). "
+                f"{vazios} sem nenhuma chamada, {falhas} com falha.")
+    return pd.DataFrame(registros, columns=webscraper_editais.BRONZE_COLUMNS + ['coletado_em'])
+
+
+def consolidar_bronze(df):
+    """Mantém uma linha por chamada, com os dados da coleta mais recente em que ela apareceu.
+
+    Aplica a mesma validação por fonte do ciclo normal (webscraper_editais.validar_registros).
+    """
+    validados = [webscraper_editais.validar_registros(grupo, fonte) for fonte, grupo in df.groupby('fonte', sort=True)]
+    df = pd.concat(validados).sort_index(kind='mergesort') if validados else df.iloc[0:0]
+    # Os registros já estão em ordem de coleta, então a última ocorrência é a versão mais recente
+    return webscraper_editais.consolidar_chamadas(df.drop(columns=['coletado_em']))
+
+
+def run(workers=None, dt_referencia=None):
+    snapshots = listar_snapshots()
+    if not snapshots:
+        logger.warning(f"Nenhuma página arquivada encontrada em {webscraper_editais.archive_dir}.")
+        return
+
+    logger.info(f"Reparseando {len(snapshots)} página(s) única(s) com {workers or os.cpu_count()} processo(s).")
+    df = reparsear_arquivo(snapshots, workers)
+    if df.empty:
+        logger.warning("Nenhuma chamada extraída do arquivo.")
+        return
+
+    bronze = consolidar_bronze(df)
+    logger.info(f"Bronze reconstruída: {len(bronze)} chamada(s).")
+    if webscraper_editais.salvar_bronze(bronze):
+        tratamento_dados.processar_parquet(webscraper_editais.output_path, dt_referencia=dt_referencia)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstrói bronze/silver/gold a partir das páginas arquivadas.")
+    parser.add_argument("--workers", type=int, default=None, help="Processos de parsing (padrão: núcleos da CPU).")
+    parser.add_argument("--data-referencia", default=None,
+                        help="Data usada como 'hoje' na camada gold, AAAA-MM-DD (padrão: agora).")
+    args = parser.parse_args()
+
+    dt_referencia = datetime.strptime(args.data_referencia, "%Y-%m-%d") if args.data_referencia else None
+    run(args.workers, dt_referencia)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    main()
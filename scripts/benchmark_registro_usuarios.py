@@ -0,0 +1,109 @@
+"""Benchmark de memória e tempo do registro de usuários (registro_usuarios.UserRegistry).
+
+Compara o registro compacto com o formato antigo (dict[str, bool] + lista de IDs
+ativos montada a cada envio) para 1M e 10M de usuários.
+
+Uso:
+    python benchmark_registro_usuarios.py [--tamanhos 1000000 10000000] [--sem-dict]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from registro_usuarios import UserRegistry
+
+N_CONSULTAS = 100_000
+FRACAO_ATIVOS = 0.8
+
+
+def cronometrar(func):
+    inicio = time.perf_counter()
+    resultado = func()
+    return time.perf_counter() - inicio, resultado
+
+
+def gerar_usuarios(n, rng):
+    # Chat IDs reais são esparsos: IDs únicos com saltos aleatórios, em ordem embaralhada
+    ids = 10_000_000 + np.cumsum(rng.integers(1, 1000, size=n, dtype=np.int64))
+    rng.shuffle(ids)
+    ativos = rng.random(n) < FRACAO_ATIVOS
+    return ids, ativos
+
+
+def benchmark_registro(ids, ativos, rng):
+    resultados = {}
+    tracemalloc.start()
+    resultados['construção (s)'], registry = cronometrar(lambda: UserRegistry.from_arrays(ids, ativos))
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    resultados['memória (MB)'] = (registry._ids.nbytes + registry._bitmap.nbytes) / 1e6
+    resultados['pico na construção (MB)'] = pico / 1e6
+
+    consultas = rng.choice(ids, size=N_CONSULTAS).tolist()
+    tempo, _ = cronometrar(lambda: [registry.is_active(c) for c in consultas])
+    resultados['consulta (µs/op)'] = tempo / N_CONSULTAS * 1e6
+
+    tempo, _ = cronometrar(lambda: [registry.set_active(c, False) for c in consultas])
+    resultados['alternar (µs/op)'] = tempo / N_CONSULTAS * 1e6
+
+    novos = (np.int64(10) ** 11 + np.arange(N_CONSULTAS, dtype=np.int64)).tolist()
+    tempo, _ = cronometrar(lambda: [registry.set_active(c, True) for c in novos])
+    resultados['inserir novo (µs/op)'] = tempo / N_CONSULTAS * 1e6
+
+    resultados['contar ativos (s)'], _ = cronometrar(registry.active_count)
+    resultados['iterar ativos (s)'], _ = cronometrar(lambda: sum(len(c) for c in registry.iter_active_chunks()))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        caminho = os.path.join(tmp, "usuarios.bin")
+        resultados['salvar snapshot (s)'], _ = cronometrar(lambda: registry.save(caminho))
+        resultados['snapshot (MB)'] = os.path.getsize(caminho) / 1e6
+        resultados['carregar snapshot (s)'], _ = cronometrar(lambda: UserRegistry.load(caminho))
+    return resultados
+
+
+def benchmark_dict(ids, ativos, rng):
+    resultados = {}
+    tracemalloc.start()
+    resultados['construção (s)'], usuarios = cronometrar(
+        lambda: {str(k): bool(v) for k, v in zip(ids.tolist(), ativos.tolist())})
+    resultados['memória (MB)'] = tracemalloc.get_traced_memory()[0] / 1e6
+    tracemalloc.stop()
+
+    consultas = [str(c) for c in rng.choice(ids, size=N_CONSULTAS).tolist()]
+    tempo, _ = cronometrar(lambda: [usuarios.get(c, False) for c in consultas])
+    resultados['consulta (µs/op)'] = tempo / N_CONSULTAS * 1e6
+    resultados['iterar ativos (s)'], _ = cronometrar(
+        lambda: [user_id for user_id, active in usuarios.items() if active])
+    return resultados
+
+
+def imprimir(titulo, resultados):
+    print(f"  {titulo}")
+    for nome, valor in resultados.items():
+        print(f"    {nome:<26}{valor:>12.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do registro de usuários.")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--sem-dict", action="store_true", help="Não mede o formato antigo (dict), que é lento e usa muita memória.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for n in args.tamanhos:
+        rng = np.random.default_rng(args.seed)
+        ids, ativos = gerar_usuarios(n, rng)
+        print(f"=== {n:,} usuários ({FRACAO_ATIVOS:.0%} ativos) ===")
+        imprimir("UserRegistry", benchmark_registro(ids, ativos, rng))
+        if not args.sem_dict:
+            imprimir("dict[str, bool] (formato antigo)", benchmark_dict(ids, ativos, rng))
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,18 +5,25 @@ import pandas as pd
 import json
 import os
 import logging
-from telegram import Update, Bot
-from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes, Application
+from telegram import Update, Bot, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
+from telegram.ext import ApplicationBuilder, CommandHandler, CallbackQueryHandler, ContextTypes, Application, BaseUpdateProcessor
 from datetime import datetime
+from collections import defaultdict
 import time
 import asyncio
+import hashlib
 from pathlib import Path
+from registro_usuarios import load_registry
 
 # --- Configurações --- 
 CREDENCIAIS_PATH = "./credenciais.json"
 DATAFILE = "./data/chamadas_bolsas_ipea_gold.parquet" 
-USER_DB = "./data/usuarios_bot.json" 
+USER_DB = "./data/usuarios_bot.bin" # Snapshot binário do registro de usuários
+USER_DB_LEGACY_JSON = "./data/usuarios_bot.json" # Formato antigo, migrado na primeira carga
+USER_SAVE_DELAY = 5 # Segundos - Alterações de usuários nesse intervalo são salvas de uma vez
 ALERTED_EDITAIS_DB = "./data/alerted_editais.json"
+DEFAULT_FONTE = "ipea_bolsas" # Fonte assumida para dados e alertas gravados antes da coluna 'fonte'
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -28,6 +35,19 @@ df_cache = None
 last_load_time = 0
 last_mod_time = 0
 CACHE_DURATION = 60 # Segundos - Recarrega o Parquet se mais antigo que isso ou se modificado
+data_version = None # Hash da lista de editais abertos; só muda quando o conteúdo muda
+
+# --- Cache de Páginas do /abertos ---
+ABERTOS_PAGE_SIZE = 5 # Editais por página
+abertos_pages_cache = {'version': None, 'pages': []}
+
+# --- Concorrência de Updates ---
+MAX_CONCURRENT_UPDATES = 32 # Updates processados ao mesmo tempo (somando todos os chats)
+MAX_PENDING_PER_CHAT = 5 # Updates distintos aguardando por chat; acima disso são descartados
+
+# --- Registro de Usuários ---
+user_registry = None
+_user_save_handle = None
 
 # Variável para controlar o loop de verificação
 checking_active = True
@@ -51,9 +71,25 @@ def carregar_config(path=CREDENCIAIS_PATH):
         logger.error(f"Erro ao ler ou processar {path}: {e}")
         return None
 
-def load_data_with_cache(filepath=DATAFILE):
-    """Carrega dados do Parquet com cache simples baseado no tempo de modificação."""
-    global df_cache, last_load_time, last_mod_time
+def calcular_versao_abertos(df):
+    """Hash curto dos editais abertos (identificação, link e prazo).
+
+    Recarregar o mesmo arquivo gera a mesma versão, então as páginas do /abertos
+    só são remontadas quando a lista de fato muda.
+    """
+    if 'edital_aberto' not in df.columns:
+        return None
+    cols = [c for c in ['fonte', 'numero_chamada', 'ano_chamada', 'link_chamada', 'dt_fim'] if c in df.columns]
+    abertos = df.loc[df['edital_aberto'] == 1, cols].sort_values(cols)
+    return hashlib.sha1(abertos.to_csv(index=False).encode('utf-8')).hexdigest()[:12]
+
+def load_data_with_cache(filepath=None, copy=True):
+    """Carrega dados do Parquet com cache simples baseado no tempo de modificação.
+
+    Com copy=False devolve o próprio DataFrame em cache, que não deve ser modificado.
+    """
+    global df_cache, last_load_time, last_mod_time, data_version
+    filepath = filepath or DATAFILE
     try:
         current_mod_time = os.path.getmtime(filepath)
         now = time.time()
@@ -72,6 +108,8 @@ def load_data_with_cache(filepath=DATAFILE):
                 # Retornando o que tem, mas logando o erro.
                 pass # Continua com as colunas que tem
 
+            if 'fonte' not in df.columns:
+                df['fonte'] = DEFAULT_FONTE
             if 'numero_chamada' in df.columns:
                 df['numero_chamada'] = df['numero_chamada'].astype(str)
             if 'ano_chamada' in df.columns:
@@ -89,10 +127,11 @@ def load_data_with_cache(filepath=DATAFILE):
             df_cache = df
             last_load_time = now
             last_mod_time = current_mod_time
+            data_version = calcular_versao_abertos(df)
             logger.info(f"Cache atualizado. {len(df_cache)} linhas carregadas.")
         else:
             logger.debug("Usando dados do cache.")
-        return df_cache.copy() # Retorna cópia para evitar modificação acidental do cache
+        return df_cache.copy() if copy else df_cache # Cópia evita modificação acidental do cache
 
     except FileNotFoundError:
         logger.error(f"Arquivo Parquet não encontrado em {filepath}")
@@ -103,26 +142,30 @@ def load_data_with_cache(filepath=DATAFILE):
         # Não invalida o cache necessariamente, pode ser erro temporário
         return None
 
-def load_users():
-    """Carrega usuários do JSON (agora como dicionário)."""
-    if not os.path.exists(USER_DB):
-        return {}
+def get_user_registry():
+    """Retorna o registro de usuários, carregando-o do disco na primeira chamada."""
+    global user_registry
+    if user_registry is None:
+        user_registry = load_registry(USER_DB, USER_DB_LEGACY_JSON)
+        logger.info(f"Registro de usuários carregado: {len(user_registry)} usuário(s).")
+    return user_registry
+
+def save_users():
+    """Salva o snapshot do registro de usuários."""
+    global _user_save_handle
+    if _user_save_handle is not None:
+        _user_save_handle.cancel()
+        _user_save_handle = None
     try:
-        with open(USER_DB, "r", encoding='utf-8') as f:
-            # Garante que as chaves sejam strings (IDs de usuário)
-            data = json.load(f)
-            return {str(k): v for k, v in data.items()} 
-    except (json.JSONDecodeError, IOError) as e:
-        logger.error(f"Erro ao carregar JSON de usuários {USER_DB}: {e}. Retornando vazio.")
-        return {}
+        get_user_registry().save(USER_DB)
+    except OSError as e:
+        logger.error(f"Erro ao salvar registro de usuários {USER_DB}: {e}")
 
-def save_users(users_dict):
-    """Salva usuários no JSON (como dicionário)."""
-    try:
-        with open(USER_DB, "w", encoding='utf-8') as f:
-            json.dump(users_dict, f, ensure_ascii=False, indent=4)
-    except IOError as e:
-        logger.error(f"Erro ao salvar JSON de usuários {USER_DB}: {e}")
+def schedule_save_users():
+    """Agenda o salvamento do registro; várias alterações seguidas geram uma única gravação."""
+    global _user_save_handle
+    if _user_save_handle is None:
+        _user_save_handle = asyncio.get_running_loop().call_later(USER_SAVE_DELAY, save_users)
 
 def load_alerted_editais():
     """Carrega os editais já alertados do JSON."""
@@ -171,33 +214,143 @@ def format_remaining_time(total_hours):
         logger.warning(f"Erro ao formatar horas {total_hours}: {e}")
         return "Erro"
 
-        
+
+# --- Processamento Concorrente de Updates ---
+
+class ChatUpdateProcessor(BaseUpdateProcessor):
+    """Processa updates de chats diferentes em paralelo, mantendo a ordem dentro de cada chat.
+
+    - Um comando idêntico ao update mais recente do mesmo chat, enquanto este ainda
+      está na fila ou em execução, é coalescido: a repetição é descartada. Só o mais
+      recente conta, para que sequências como /stop, /start, /stop rodem inteiras.
+    - Cada chat executa um update por vez e pode ter no máximo MAX_PENDING_PER_CHAT
+      updates aguardando, para que o spam de um usuário não ocupe as vagas dos demais.
+    """
+
+    def __init__(self, max_concurrent_updates=MAX_CONCURRENT_UPDATES, max_pending_per_chat=MAX_PENDING_PER_CHAT, on_discard=None):
+        super().__init__(max_concurrent_updates)
+        self.max_pending_per_chat = max_pending_per_chat
+        self.on_discard = on_discard # Callback opcional (update, motivo), chamado a cada update descartado
+        self._chat_locks = {}
+        self._pending_per_chat = defaultdict(int)
+        self._last_pending = {} # chat_id -> (chave, marcador) do update mais recente ainda pendente
+        # Estatísticas expostas pelo /status
+        self.waiting = 0
+        self.running = 0
+        self.processed = 0
+        self.coalesced = 0
+        self.throttled = 0
+
+    @staticmethod
+    def _update_key(update):
+        """Chave (chat, conteúdo) usada para identificar comandos repetidos."""
+        if not isinstance(update, Update):
+            return None, None
+        chat_id = update.effective_chat.id if update.effective_chat else None
+        if update.callback_query is not None:
+            conteudo = f"callback:{update.callback_query.data}"
+        elif update.effective_message is not None and update.effective_message.text:
+            conteudo = " ".join(update.effective_message.text.split())
+        else:
+            return chat_id, None # Sem conteúdo comparável, nunca é coalescido
+        return chat_id, (chat_id, conteudo)
+
+    def stats(self):
+        """Retorna as estatísticas atuais de fila e coalescência."""
+        return {
+            'aguardando': self.waiting,
+            'em_execucao': self.running,
+            'processados': self.processed,
+            'coalescidos': self.coalesced,
+            'descartados_throttle': self.throttled,
+            'chats_ativos': len(self._pending_per_chat),
+        }
+
+    async def do_process_update(self, update, coroutine):
+        # Chamado por process_update já com uma das max_concurrent_updates vagas globais.
+        # Repetições e excessos são descartados logo aqui, liberando a vaga na hora; quem
+        # espera a vez do próprio chat a mantém, mas cada chat segura no máximo
+        # max_pending_per_chat vagas.
+        chat_id, key = self._update_key(update)
+
+        ultimo = self._last_pending.get(chat_id)
+        if key is not None and ultimo is not None and ultimo[0] == key:
+            self.coalesced += 1
+            await self._discard(update, coroutine, "coalescido")
+            logger.debug(f"Update coalescido para o chat {chat_id}: {key[1]}")
+            return
+
+        if chat_id is not None and self._pending_per_chat[chat_id] >= self.max_pending_per_chat:
+            self.throttled += 1
+            await self._discard(update, coroutine, "throttle")
+            logger.warning(f"Chat {chat_id} excedeu {self.max_pending_per_chat} updates pendentes. Update descartado.")
+            return
+
+        marcador = (key, object())
+        self._last_pending[chat_id] = marcador
+        self._pending_per_chat[chat_id] += 1
+        lock = self._chat_locks.setdefault(chat_id, asyncio.Lock())
+        self.waiting += 1
+        try:
+            async with lock:
+                self.waiting -= 1
+                self.running += 1
+                try:
+                    await coroutine
+                finally:
+                    self.running -= 1
+                    self.processed += 1
+        finally:
+            if self._last_pending.get(chat_id) is marcador:
+                del self._last_pending[chat_id]
+            self._pending_per_chat[chat_id] -= 1
+            if self._pending_per_chat[chat_id] <= 0:
+                del self._pending_per_chat[chat_id]
+                self._chat_locks.pop(chat_id, None)
+
+    async def _discard(self, update, coroutine, motivo):
+        """Descarta um update sem executá-lo."""
+        coroutine.close() # Evita aviso de coroutine nunca aguardada
+        if self.on_discard is not None:
+            self.on_discard(update, motivo)
+        # Botões ficam "carregando" até o callback ser respondido
+        if isinstance(update, Update) and update.callback_query is not None:
+            try:
+                await update.callback_query.answer()
+            except Exception as e:
+                logger.debug(f"Falha ao responder callback descartado: {e}")
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+
 # --- Handlers dos Comandos --- 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    user_id = str(user.id)
-    usuarios = load_users()
+    registry = get_user_registry()
+    estava_ativo = registry.set_active(user.id, True) # Adiciona e marca como ativo por padrão
     
-    if user_id not in usuarios:
-        usuarios[user_id] = True # Adiciona e marca como ativo por padrão
-        save_users(usuarios)
+    if estava_ativo is None:
+        schedule_save_users()
         reply_text = f"Olá {user.mention_html()}! ✅ Você foi adicionado e receberá alertas de novos editais.\nUse /stop para parar ou /ajuda para ver comandos."
     else:
         reply_text = f"Olá {user.mention_html()}! Você já está na lista. Use /ajuda para comandos."
-        if not usuarios.get(user_id, False): # Se estava na lista mas inativo
-             usuarios[user_id] = True
-             save_users(usuarios)
+        if not estava_ativo: # Se estava na lista mas inativo
+             schedule_save_users()
              reply_text += "\nSeus alertas foram reativados!"
              
     await update.message.reply_html(reply_text)
 
 async def stop(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_id = str(update.effective_user.id)
-    usuarios = load_users()
-    if user_id in usuarios and usuarios[user_id]:
-        usuarios[user_id] = False # Marca como inativo em vez de remover
-        save_users(usuarios)
+    user_id = update.effective_user.id
+    registry = get_user_registry()
+    if registry.is_active(user_id):
+        registry.set_active(user_id, False) # Marca como inativo em vez de remover
+        schedule_save_users()
         await update.message.reply_text("❌ Alertas desativados. Você não receberá mais notificações.")
     else:
         await update.message.reply_text("ℹ️ Você já não estava recebendo alertas.")
@@ -210,8 +363,9 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         "/stop - Desativa o recebimento de alertas.\n"
         "/ajuda - Mostra esta mensagem.\n"
         "/mais_recente - Mostra o número do edital mais recente.\n"
-        "/link <numero> - Obtém o link do edital (ex: /link 33).\n"
-        "/abertos - Lista os editais com inscrições abertas.\n\n"
+        "/link <numero> [fonte] - Obtém o link do edital (ex: /link 33).\n"
+        "/abertos - Lista os editais com inscrições abertas.\n"
+        "/status - Mostra a fila de processamento do bot.\n\n"
         "*Nota:* A verificação de novos editais precisa é feita externamente por outro componente da solução."
     )
     await update.message.reply_text(help_text)
@@ -249,9 +403,10 @@ async def mais_recente(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def link_por_numero(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not context.args:
-        await update.message.reply_text("❗ Uso: /link <numero_do_edital>")
+        await update.message.reply_text("❗ Uso: /link <numero_do_edital> [fonte]")
         return
     numero_query = context.args[0]
+    fonte_query = context.args[1] if len(context.args) > 1 else None
 
     df = load_data_with_cache()
     if df is None or df.empty:
@@ -263,14 +418,21 @@ async def link_por_numero(update: Update, context: ContextTypes.DEFAULT_TYPE):
              await update.message.reply_text("Erro: Colunas 'numero_chamada' ou 'link_chamada' não encontradas.")
              return
              
-        # Busca pelo número (comparando como string)
+        # Busca pelo número (comparando como string) e, se informada, pela fonte
         edital = df[df['numero_chamada'] == numero_query]
+        if fonte_query:
+            edital = edital[edital['fonte'] == fonte_query]
         
         if edital.empty:
             await update.message.reply_text(f"🚫 Edital nº {numero_query} não encontrado.")
-        else:
+        elif len(edital) == 1:
             url = edital.iloc[0]['link_chamada']
             await update.message.reply_text(f"🔗 Link do edital {numero_query}: {url}")
+        else:
+            # Mesmo número em fontes ou anos diferentes: lista todos
+            linhas = [f"• {row['numero_chamada']}/{row['ano_chamada']} ({row['fonte']}): {row['link_chamada']}"
+                      for _, row in edital.sort_values(['fonte', 'ano_chamada']).iterrows()]
+            await update.message.reply_text(f"🔗 Editais nº {numero_query}:\n" + "\n".join(linhas))
             
     except KeyError as e:
         logger.error(f"KeyError em /link: {e}")
@@ -279,44 +441,73 @@ async def link_por_numero(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.error(f"Erro inesperado em /link para {numero_query}: {e}")
         await update.message.reply_text("Ocorreu um erro ao buscar o link.")
 
-async def editais_abertos(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    df = load_data_with_cache()
+def get_abertos_pages():
+    """Retorna as páginas já formatadas do /abertos para a versão atual dos dados.
+
+    As páginas só são montadas de novo quando a lista de editais abertos muda;
+    trocar de página é apenas uma consulta à lista. Cada página é uma lista de
+    (numero, ano, link, dt_fim); as horas restantes são calculadas ao renderizar.
+
+    Returns:
+        tuple: (versão dos dados, lista de páginas), ou (None, None) se os dados não puderam ser carregados.
+
+    Raises:
+        KeyError: Se as colunas 'edital_aberto' ou 'dt_fim' não existirem.
+    """
+    df = load_data_with_cache(copy=False)
     if df is None or df.empty:
-        await update.message.reply_text("Desculpe, não consegui carregar os dados dos editais agora.")
-        return
+        return None, None
+    if data_version is not None and abertos_pages_cache['version'] == data_version:
+        return data_version, abertos_pages_cache['pages']
+
+    if 'edital_aberto' not in df.columns or 'dt_fim' not in df.columns:
+        raise KeyError("'edital_aberto' ou 'dt_fim'")
+
+    # Filtrar usando a coluna pré-calculada e ordenar por data de fim mais próxima
+    abertos_sorted = df[df['edital_aberto'] == 1].sort_values('dt_fim', ascending=True)
+
+    resumos = [
+        (row.get('numero_chamada', '?'), row.get('ano_chamada', '?'), row.get('link_chamada', 'N/A'), row['dt_fim'])
+        for _, row in abertos_sorted.iterrows()
+    ]
+
+    pages = [resumos[i:i + ABERTOS_PAGE_SIZE] for i in range(0, len(resumos), ABERTOS_PAGE_SIZE)]
+    abertos_pages_cache['version'] = data_version
+    abertos_pages_cache['pages'] = pages
+    logger.info(f"Páginas do /abertos montadas: {len(resumos)} edital(is) em {len(pages)} página(s).")
+    return data_version, pages
+
+def render_abertos_page(version, pages, page):
+    """Monta o texto e os botões de navegação de uma página do /abertos."""
+    total = len(pages)
+    now_dt = datetime.now()
+    resumos = []
+    for num, ano, link, dt_fim in pages[page]:
+        horas_rest = round(max((dt_fim - now_dt).total_seconds() / 3600, 0), 2) if pd.notna(dt_fim) else 0
+        # Escape para MarkdownV2 se necessário, ou usar HTML parse_mode
+        resumos.append(f"📌 Edital *{num}/{ano}*\n⏳ Restam: *{horas_rest}* horas\n🔗 Link: {link}")
+    texto = f"*Editais Abertos* (página {page + 1}/{total}):\n\n" + "\n\n".join(resumos)
+    botoes = []
+    if page > 0:
+        botoes.append(InlineKeyboardButton("◀️ Anterior", callback_data=f"abertos:{version}:{page - 1}"))
+    if page < total - 1:
+        botoes.append(InlineKeyboardButton("Próxima ▶️", callback_data=f"abertos:{version}:{page + 1}"))
+    reply_markup = InlineKeyboardMarkup([botoes]) if botoes else None
+    return texto, reply_markup
 
+async def editais_abertos(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        if 'edital_aberto' not in df.columns or 'dt_fim' not in df.columns:
-             await update.message.reply_text("Erro: Colunas 'edital_aberto' ou 'dt_fim' não encontradas.")
-             return
-             
-        # Filtrar usando a coluna pré-calculada
-        abertos = df[df['edital_aberto'] == 1].copy()
-        
-        if abertos.empty:
+        version, pages = get_abertos_pages()
+        if pages is None:
+            await update.message.reply_text("Desculpe, não consegui carregar os dados dos editais agora.")
+            return
+
+        if not pages:
             await update.message.reply_text("✅ Nenhum edital aberto encontrado no momento.")
             return
 
-        # Ordenar por data de fim mais próxima
-        abertos_sorted = abertos.sort_values('dt_fim', ascending=True)
-
-        mensagens = ["*Editais Abertos:*\n"] # Usando Markdown V2 requer escape
-        for _, row in abertos_sorted.iterrows():
-            num = row.get('numero_chamada', '?')
-            ano = row.get('ano_chamada', '?')
-            link = row.get('link_chamada', 'N/A')
-            horas_rest = round(row.get('horas_restantes', 0),2)
-            
-            # Escape para MarkdownV2 se necessário, ou usar HTML parse_mode
-            resumo = f"📌 Edital *{num}/{ano}*\n⏳ Restam: *{horas_rest}* horas\n🔗 Link: {link}"
-            mensagens.append(resumo)
-
-        mensagem_final = "\n\n".join(mensagens)
-        # Limitar tamanho da mensagem se necessário (Telegram tem limite)
-        if len(mensagem_final) > 4000: # Limite aproximado
-             mensagem_final = mensagem_final[:4000] + "... (lista muito longa)"
-             
-        await update.message.reply_text(mensagem_final, parse_mode='Markdown') # Usar Markdown ou HTML
+        texto, reply_markup = render_abertos_page(version, pages, 0)
+        await update.message.reply_text(texto, parse_mode='Markdown', reply_markup=reply_markup) # Usar Markdown ou HTML
 
     except KeyError as e:
         logger.error(f"KeyError em /abertos: {e}")
@@ -325,72 +516,129 @@ async def editais_abertos(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.error(f"Erro inesperado em /abertos: {e}")
         await update.message.reply_text("Ocorreu um erro ao listar os editais abertos.")
 
+async def editais_abertos_pagina(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Troca a página do /abertos editando a mensagem original (botões Anterior/Próxima)."""
+    query = update.callback_query
+    await query.answer()
+
+    try:
+        _, versao_botao, page = query.data.split(":")
+        version, pages = get_abertos_pages()
+        if pages is None:
+            await query.edit_message_text("Desculpe, não consegui carregar os dados dos editais agora.")
+            return
+        if not pages:
+            await query.edit_message_text("✅ Nenhum edital aberto encontrado no momento.")
+            return
+
+        # Se os dados mudaram desde que a mensagem foi enviada, mostra a página equivalente da lista nova
+        page = min(max(int(page), 0), len(pages) - 1)
+        texto, reply_markup = render_abertos_page(version, pages, page)
+        if versao_botao != str(version):
+            texto += "\n\n_A lista foi atualizada desde a última consulta._"
+        await query.edit_message_text(texto, parse_mode='Markdown', reply_markup=reply_markup)
+
+    except BadRequest as e:
+        # Clique repetido na mesma página: o conteúdo não mudou, nada a fazer
+        if "not modified" not in str(e).lower():
+            logger.error(f"Erro ao paginar /abertos ({query.data}): {e}")
+    except (KeyError, ValueError) as e:
+        logger.error(f"Erro ao paginar /abertos ({query.data}): {e}")
+    except Exception as e:
+        logger.error(f"Erro inesperado ao paginar /abertos: {e}")
+
+async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Mostra a profundidade das filas e as estatísticas de coalescência."""
+    processor = context.application.update_processor
+    if not isinstance(processor, ChatUpdateProcessor):
+        await update.message.reply_text("Estatísticas indisponíveis.")
+        return
+    stats = processor.stats()
+    await update.message.reply_text(
+        "📊 Status do bot\n"
+        f"Fila de entrada: {context.application.update_queue.qsize()}\n"
+        f"Aguardando: {stats['aguardando']}\n"
+        f"Em execução: {stats['em_execucao']}\n"
+        f"Processados: {stats['processados']}\n"
+        f"Coalescidos: {stats['coalescidos']}\n"
+        f"Descartados (throttle): {stats['descartados_throttle']}\n"
+        f"Chats ativos: {stats['chats_ativos']}"
+    )
+
 
 
 # --- Função para Alerta ---
-async def check_for_new_editais(app: Application):
-    """Função que verifica novos editais e envia alertas agrupados."""
-    global checking_active
-    
-    while checking_active:
-        logger.info("Verificando novos editais...")
-        df_current = load_data_with_cache()
-        if df_current is None or df_current.empty:
-            logger.warning("Não foi possível carregar dados para verificar novos editais.")
-            await asyncio.sleep(3600)
-            continue
-
-        alerted_editais = load_alerted_editais()
-        new_editais_to_alert = []
-
-        # Criar um conjunto de editais já alertados para busca eficiente
-        alerted_set = set((e['numero_chamada'], e['ano_chamada']) for e in alerted_editais)
-
-        for _, row in df_current.iterrows():
-            num = row.get('numero_chamada')
-            ano = row.get('ano_chamada')
-            link = row.get('link_chamada')
-
-            if num and ano and (num, ano) not in alerted_set:
-                new_editais_to_alert.append({
-                    'numero_chamada': num,
-                    'ano_chamada': ano,
-                    'link_chamada': link
-                })
-                alerted_editais.append({'numero_chamada': num, 'ano_chamada': ano})
-
-        if new_editais_to_alert:
-            logger.info(f"Encontrados {len(new_editais_to_alert)} novos edital(is).")
-            
-            # Agrupa todos os novos editais em uma única mensagem
-            usuarios = load_users()
-            active_users_ids = [user_id for user_id, active in usuarios.items() if active]
-            
-            if not active_users_ids:
-                logger.info("Nenhum usuário ativo para receber alertas de novos editais.")
+async def verificar_novos_editais(app: Application):
+    """Executa um ciclo de verificação: detecta editais novos e envia um alerta agrupado.
+
+    Returns:
+        int: Quantidade de editais novos encontrados, ou None se os dados não puderam ser carregados.
+    """
+    df_current = load_data_with_cache()
+    if df_current is None or df_current.empty:
+        logger.warning("Não foi possível carregar dados para verificar novos editais.")
+        return None
+
+    alerted_editais = load_alerted_editais()
+    new_editais_to_alert = []
+    encerrados_ignorados = 0
+
+    # Criar um conjunto de editais já alertados para busca eficiente
+    alerted_set = set((e.get('fonte', DEFAULT_FONTE), e['numero_chamada'], e['ano_chamada']) for e in alerted_editais)
+
+    for _, row in df_current.iterrows():
+        num = row.get('numero_chamada')
+        ano = row.get('ano_chamada')
+        link = row.get('link_chamada')
+        fonte = row.get('fonte', DEFAULT_FONTE)
+
+        if num and ano and (fonte, num, ano) not in alerted_set:
+            alerted_editais.append({'fonte': fonte, 'numero_chamada': num, 'ano_chamada': ano})
+            # Editais já encerrados (ex: recuperados por um backfill) são registrados sem alerta
+            if row.get('edital_aberto') != 1:
+                encerrados_ignorados += 1
+                continue
+            new_editais_to_alert.append({
+                'numero_chamada': num,
+                'ano_chamada': ano,
+                'link_chamada': link
+            })
+
+    if encerrados_ignorados:
+        logger.info(f"{encerrados_ignorados} edital(is) encerrado(s) ainda não conhecido(s) registrado(s) sem alerta.")
+
+    if new_editais_to_alert:
+        logger.info(f"Encontrados {len(new_editais_to_alert)} novos edital(is).")
+        
+        # Agrupa todos os novos editais em uma única mensagem
+        registry = get_user_registry()
+        
+        if registry.active_count() == 0:
+            logger.info("Nenhum usuário ativo para receber alertas de novos editais.")
+        else:
+            # Prepara mensagem consolidada
+            if len(new_editais_to_alert) == 1:
+                # Mensagem única para um único edital
+                edital = new_editais_to_alert[0]
+                msg = (
+                    "📢 *NOVO EDITAL PUBLICADO*\n\n"
+                    f"Edital nº *{edital['numero_chamada']}/{edital['ano_chamada']}*\n"
+                    f"🔗 Link: {edital['link_chamada']}"
+                )
             else:
-                # Prepara mensagem consolidada
-                if len(new_editais_to_alert) == 1:
-                    # Mensagem única para um único edital
-                    edital = new_editais_to_alert[0]
-                    msg = (
-                        "📢 *NOVO EDITAL PUBLICADO*\n\n"
-                        f"Edital nº *{edital['numero_chamada']}/{edital['ano_chamada']}*\n"
-                        f"🔗 Link: {edital['link_chamada']}"
-                    )
-                else:
-                    # Mensagem consolidada para múltiplos editais
-                    editais_list = "\n".join(
-                        f"• Edital {edital['numero_chamada']}/{edital['ano_chamada']}\n  🔗 {edital['link_chamada']}"
-                        for edital in new_editais_to_alert
-                    )
-                    msg = (
-                        f"📢 *{len(new_editais_to_alert)} NOVOS EDITAIS PUBLICADOS*\n\n"
-                        f"{editais_list}"
-                    )
-
-                # Envia a mensagem para todos os usuários ativos
-                for user_id in active_users_ids:
+                # Mensagem consolidada para múltiplos editais
+                editais_list = "\n".join(
+                    f"• Edital {edital['numero_chamada']}/{edital['ano_chamada']}\n  🔗 {edital['link_chamada']}"
+                    for edital in new_editais_to_alert
+                )
+                msg = (
+                    f"📢 *{len(new_editais_to_alert)} NOVOS EDITAIS PUBLICADOS*\n\n"
+                    f"{editais_list}"
+                )
+
+            # Envia a mensagem para todos os usuários ativos, percorrendo o registro em blocos
+            for chunk in registry.iter_active_chunks():
+                for user_id in chunk.tolist():
                     try:
                         await app.bot.send_message(
                             chat_id=user_id,
@@ -402,10 +650,21 @@ async def check_for_new_editais(app: Application):
                     except Exception as e:
                         logger.error(f"Falha ao enviar alerta para {user_id}: {e}")
 
+        save_alerted_editais(alerted_editais)
+    else:
+        if encerrados_ignorados:
             save_alerted_editais(alerted_editais)
-        else:
-            logger.info("Nenhum novo edital encontrado.")
-        
+        logger.info("Nenhum novo edital encontrado.")
+
+    return len(new_editais_to_alert)
+
+async def check_for_new_editais(app: Application):
+    """Função que verifica novos editais e envia alertas agrupados."""
+    global checking_active
+    
+    while checking_active:
+        logger.info("Verificando novos editais...")
+        await verificar_novos_editais(app)
         await asyncio.sleep(3600)
 
 async def shutdown(application: Application):
@@ -417,15 +676,26 @@ async def shutdown(application: Application):
 
 # --- Função Principal do Bot --- 
 
-def main():
-    """Inicia o bot e configura os handlers."""
-    TELEGRAM_TOKEN = carregar_config()
-    if not TELEGRAM_TOKEN:
-        logger.critical("Falha ao carregar o token do Telegram. Encerrando.")
-        return
-
-    # Cria a Application
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
+def build_application(token, base_url=None, update_processor=None):
+    """Cria a Application com o processador de updates e todos os handlers registrados.
+
+    Args:
+        token (str): Token do bot.
+        base_url (str, optional): URL base da Bot API (ex: servidor local usado no teste de carga).
+            Se None, usa a API oficial do Telegram.
+        update_processor (ChatUpdateProcessor, optional): Processador de updates a usar.
+            Se None, cria um com MAX_CONCURRENT_UPDATES e MAX_PENDING_PER_CHAT.
+    """
+    if update_processor is None:
+        update_processor = ChatUpdateProcessor(MAX_CONCURRENT_UPDATES, MAX_PENDING_PER_CHAT)
+    builder = (
+        Application.builder()
+        .token(token)
+        .concurrent_updates(update_processor)
+    )
+    if base_url:
+        builder = builder.base_url(base_url)
+    application = builder.build()
 
     # Registra os handlers
     application.add_handler(CommandHandler("start", start))
@@ -434,11 +704,32 @@ def main():
     application.add_handler(CommandHandler("mais_recente", mais_recente))
     application.add_handler(CommandHandler("link", link_por_numero))
     application.add_handler(CommandHandler("abertos", editais_abertos))
+    application.add_handler(CallbackQueryHandler(editais_abertos_pagina, pattern=r"^abertos:"))
+    application.add_handler(CommandHandler("status", status))
     
     # Adicionar outros handlers se necessário (e.g., para /verificar_novos se integrado)
 
       # Configura o shutdown handler
     application.add_handler(CommandHandler("shutdown", lambda u, c: shutdown(application)))
+    return application
+
+def main():
+    """Inicia o bot e configura os handlers."""
+    TELEGRAM_TOKEN = carregar_config()
+    if not TELEGRAM_TOKEN:
+        logger.critical("Falha ao carregar o token do Telegram. Encerrando.")
+        return
+
+    # Carrega os usuários antes de aceitar comandos: com o arquivo ilegível o bot não
+    # pode começar vazio, senão o próximo salvamento apagaria todos os inscritos
+    try:
+        get_user_registry()
+    except (OSError, ValueError) as e:
+        logger.critical(f"Falha ao carregar o registro de usuários: {e}. Encerrando.")
+        return
+
+    # Cria a Application
+    application = build_application(TELEGRAM_TOKEN)
 
     # Cria e inicia a tarefa de verificação de novos editais
     loop = asyncio.get_event_loop()
@@ -456,6 +747,8 @@ def main():
         checking_active = False
         if not check_task.done():
             check_task.cancel()
+        if user_registry is not None:
+            save_users() # Grava alterações ainda não salvas
         logger.info("Bot encerrado.")
 
 
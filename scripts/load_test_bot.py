@@ -0,0 +1,470 @@
+# -*- coding: utf-8 -*-
+"""Teste de carga do bot_editais contra uma Bot API do Telegram falsa, rodando localmente.
+
+Sobe um servidor HTTP que imita os métodos da Bot API usados pelo bot (getUpdates,
+sendMessage, ...), inicia o bot_editais apontando para ele e simula milhares de
+usuários enviando comandos a uma taxa configurável. No meio da execução um novo
+edital é publicado para disparar o alerta para todos os usuários ativos.
+
+Ao final, mostra a latência dos comandos (p50/p95/p99), os updates descartados e o
+tempo de conclusão do envio dos alertas.
+
+Uso:
+    python load_test_bot.py --usuarios 5000 --taxa 200 --duracao 30 --alerta-em 15
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import bot_editais
+
+# logger
+logger = logging.getLogger(__name__)
+
+# --- Configurações ---
+TOKEN = "123456:LOADTEST"
+PRIMEIRO_CHAT_ID = 10_000_000
+ALERTA_PREFIXO = "📢" # Mensagens que começam assim são alertas, não respostas a comandos
+MIX_PADRAO = "start=1,abertos=3,mais_recente=2,link=2,ajuda=1,stop=0.2"
+
+
+# --- Bot API Falsa ---
+
+class StubTelegramAPI:
+    """Servidor HTTP local que responde como a Bot API do Telegram.
+
+    Os updates injetados com push_update() são entregues ao bot via getUpdates
+    (com long polling), e cada mensagem enviada pelo bot é repassada ao callback
+    on_message(chat_id, text, instante).
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, on_message=None):
+        self.on_message = on_message
+        self._cond = threading.Condition()
+        self._updates = deque()
+        self._next_update_id = 1
+        self._next_message_id = 1
+        self._closed = False
+        self.pushed = 0
+        self.delivered = 0
+        self.requests = defaultdict(int)
+
+        self.server = ThreadingHTTPServer((host, port), _StubHandler)
+        self.server.daemon_threads = True
+        self.server.stub = self
+        self._thread = threading.Thread(target=self.server.serve_forever, name="stub-telegram", daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/bot"
+
+    def start(self):
+        self._thread.start()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def push_update(self, chat_id, text):
+        """Enfileira uma mensagem de texto como se o usuário chat_id a tivesse enviado.
+
+        Returns:
+            int: update_id atribuído.
+        """
+        comando = text.split()[0]
+        with self._cond:
+            update = {
+                "update_id": self._next_update_id,
+                "message": {
+                    "message_id": self._next_message_id,
+                    "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private", "first_name": f"Usuario {chat_id}"},
+                    "from": {"id": chat_id, "is_bot": False, "first_name": f"Usuario {chat_id}"},
+                    "text": text,
+                    "entities": [{"type": "bot_command", "offset": 0, "length": len(comando)}],
+                },
+            }
+            self._next_update_id += 1
+            self._next_message_id += 1
+            self._updates.append(update)
+            self.pushed += 1
+            self._cond.notify_all()
+            return update["update_id"]
+
+    def pending_updates(self):
+        """Updates injetados que o bot ainda não buscou."""
+        with self._cond:
+            return self.pushed - self.delivered
+
+    def get_updates(self, offset, limit, timeout):
+        with self._cond:
+            # Updates com id menor que offset foram confirmados pelo bot
+            while self._updates and self._updates[0]["update_id"] < offset:
+                self._updates.popleft()
+            if not self._updates and timeout > 0 and not self._closed:
+                self._cond.wait(timeout)
+                while self._updates and self._updates[0]["update_id"] < offset:
+                    self._updates.popleft()
+            lote = [u for _, u in zip(range(limit), self._updates)]
+            if lote:
+                # Os update_id são sequenciais a partir de 1, então o maior entregue é a contagem
+                self.delivered = max(self.delivered, lote[-1]["update_id"])
+            return lote
+
+    def new_message(self, chat_id, text, message_id=None):
+        agora = time.perf_counter()
+        with self._cond:
+            if message_id is None:
+                message_id = self._next_message_id
+                self._next_message_id += 1
+        if self.on_message is not None:
+            self.on_message(chat_id, text, agora)
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": text,
+        }
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Mantém as conexões do httpx abertas entre requisições
+
+    def log_message(self, format, *args):
+        pass # Silencia o log padrão por requisição
+
+    def _read_params(self):
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        corpo = self.rfile.read(tamanho) if tamanho else b""
+        if not corpo:
+            return {}
+        if "application/json" in (self.headers.get("Content-Type") or ""):
+            return json.loads(corpo)
+        return dict(parse_qsl(corpo.decode("utf-8")))
+
+    def _reply(self, result):
+        corpo = json.dumps({"ok": True, "result": result}).encode("utf-8")
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+        except (BrokenPipeError, ConnectionResetError):
+            # O bot desconectou (ex: getUpdates cancelado no encerramento)
+            self.close_connection = True
+
+    def do_POST(self):
+        stub = self.server.stub
+        method = self.path.rstrip("/").rsplit("/", 1)[-1]
+        params = self._read_params()
+        stub.requests[method] += 1
+
+        if method == "getMe":
+            self._reply({"id": 123456, "is_bot": True, "first_name": "Stub", "username": "stub_bot",
+                         "can_join_groups": False, "can_read_all_group_messages": False,
+                         "supports_inline_queries": False})
+        elif method == "getUpdates":
+            self._reply(stub.get_updates(
+                offset=int(params.get("offset") or 0),
+                limit=int(params.get("limit") or 100),
+                timeout=float(params.get("timeout") or 0),
+            ))
+        elif method == "sendMessage":
+            self._reply(stub.new_message(int(params["chat_id"]), params.get("text", "")))
+        elif method == "editMessageText":
+            self._reply(stub.new_message(int(params["chat_id"]), params.get("text", ""),
+                                         message_id=int(params["message_id"])))
+        else:
+            # deleteWebhook, answerCallbackQuery, close, ...
+            self._reply(True)
+
+    do_GET = do_POST
+
+
+# --- Registro de Latências ---
+
+class RegistroLatencias:
+    """Mede a latência de cada comando, pareando respostas e comandos por chat.
+
+    Todo comando sorteado é enviado, mesmo que o usuário ainda aguarde respostas
+    anteriores, para que o bot veja repetições e rajadas como na vida real. O bot
+    processa cada chat em ordem e responde cada comando executado com uma mensagem,
+    então a resposta pertence ao comando mais antigo ainda pendente do chat (uma
+    fila FIFO por chat). Comandos descartados pelo processador (coalescidos ou por
+    throttle) são retirados da fila ao serem descartados, sem consumir resposta.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filas = defaultdict(deque) # chat_id -> deque[(update_id, enviado_em, comando)]
+        self.latencias = defaultdict(list)
+        self.enviados = defaultdict(int)
+        self.descartados = defaultdict(lambda: defaultdict(int)) # motivo -> comando -> quantidade
+        self.respostas_sem_comando = 0
+        self.alertas_recebidos = 0
+        self.ultimo_alerta = None
+
+    def comando_enviado(self, chat_id, update_id, comando):
+        with self._lock:
+            self._filas[chat_id].append((update_id, time.perf_counter(), comando))
+            self.enviados[comando] += 1
+
+    def update_descartado(self, update, motivo):
+        """Callback on_discard do ChatUpdateProcessor (roda no loop do bot)."""
+        chat_id = update.effective_chat.id if update.effective_chat else None
+        with self._lock:
+            fila = self._filas.get(chat_id)
+            for item in fila or ():
+                if item[0] == update.update_id:
+                    fila.remove(item)
+                    self.descartados[motivo][item[2]] += 1
+                    return
+
+    def mensagem_recebida(self, chat_id, text, instante):
+        with self._lock:
+            if text.startswith(ALERTA_PREFIXO):
+                self.alertas_recebidos += 1
+                self.ultimo_alerta = instante
+                return
+            fila = self._filas.get(chat_id)
+            if not fila:
+                self.respostas_sem_comando += 1
+                return
+            _, enviado_em, comando = fila.popleft()
+            self.latencias[comando].append(instante - enviado_em)
+
+    def sem_resposta(self):
+        """Quantidade de comandos, por tipo, executados ou na fila mas ainda sem resposta."""
+        with self._lock:
+            contagem = defaultdict(int)
+            for fila in self._filas.values():
+                for _, _, comando in fila:
+                    contagem[comando] += 1
+            return contagem
+
+    def pendentes(self):
+        with self._lock:
+            return sum(len(fila) for fila in self._filas.values())
+
+
+def percentil(valores, p):
+    """Percentil pelo método nearest-rank (valores já ordenados)."""
+    if not valores:
+        return float("nan")
+    indice = max(0, min(len(valores) - 1, math.ceil(p / 100 * len(valores)) - 1))
+    return valores[indice]
+
+
+# --- Dados Sintéticos ---
+
+def preparar_dados(n_editais, chat_ids):
+    """Cria data/ no diretório atual com a camada gold, os usuários e os editais já alertados."""
+    os.makedirs("data", exist_ok=True)
+    hoje = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    linhas = []
+    for i in range(1, n_editais + 1):
+        # Metade dos editais abertos, metade encerrados
+        dt_fim = hoje + timedelta(days=i) if i % 2 else hoje - timedelta(days=i)
+        linhas.append(_linha_gold(i, hoje, dt_fim))
+    _salvar_gold(linhas)
+
+    with open("data/usuarios_bot.json", "w", encoding="utf-8") as f:
+        json.dump({str(chat_id): True for chat_id in chat_ids}, f)
+    with open("data/alerted_editais.json", "w", encoding="utf-8") as f:
+        json.dump([{"numero_chamada": str(l["numero_chamada"]), "ano_chamada": l["ano_chamada"]} for l in linhas], f)
+    return linhas
+
+
+def _linha_gold(numero, hoje, dt_fim):
+    dt_inicio = dt_fim - timedelta(days=30)
+    return {
+        "numero_chamada": numero,
+        "ano_chamada": str(hoje.year),
+        "link_chamada": f"https://www.ipea.gov.br/portal/chamada-{numero}",
+        "programa": "PNPD",
+        "periodo_inscricao": f"{dt_inicio:%d/%m/%Y} à {dt_fim:%d/%m/%Y}",
+        "fonte": "ipea_bolsas",
+        "dt_inicio": dt_inicio,
+        "dt_fim": dt_fim,
+        "dt_hoje": hoje,
+        "edital_aberto": int(dt_fim >= hoje),
+        "horas_restantes": 0.0,
+    }
+
+
+def _salvar_gold(linhas):
+    pq.write_table(pa.Table.from_pandas(pd.DataFrame(linhas)), "data/chamadas_bolsas_ipea_gold.parquet")
+
+
+# --- Execução do Teste ---
+
+def parse_mix(texto):
+    mix = {}
+    for parte in texto.split(","):
+        comando, peso = parte.split("=")
+        mix[comando.strip()] = float(peso)
+    return mix
+
+
+async def gerar_carga(stub, registro, args, chat_ids, numeros, rng):
+    """Injeta comandos seguindo um processo de Poisson com a taxa configurada.
+
+    Cada chegada é enviada, mesmo para usuários com comandos ainda sem resposta.
+    """
+    mix = parse_mix(args.mix)
+    comandos, pesos = list(mix), list(mix.values())
+    loop = asyncio.get_running_loop()
+    inicio = loop.time()
+    proximo = inicio
+    while proximo - inicio < args.duracao:
+        # Envia todos os comandos já vencidos de uma vez (sleep do asyncio tem resolução de ~1ms)
+        while proximo <= loop.time() and proximo - inicio < args.duracao:
+            chat_id = rng.choice(chat_ids)
+            comando = rng.choices(comandos, weights=pesos)[0]
+            texto = f"/{comando} {rng.choice(numeros)}" if comando == "link" else f"/{comando}"
+            # O bot roda neste mesmo loop, então nenhuma resposta chega entre o envio e o registro
+            registro.comando_enviado(chat_id, stub.push_update(chat_id, texto), comando)
+            proximo += rng.expovariate(args.taxa)
+        await asyncio.sleep(max(0.0, proximo - loop.time()))
+
+
+async def disparar_alerta(application, linhas, args):
+    """Publica um novo edital no meio do teste e mede o envio do alerta a todos os usuários."""
+    await asyncio.sleep(args.alerta_em)
+    hoje = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    _salvar_gold(linhas + [_linha_gold(len(linhas) + 1, hoje, hoje + timedelta(days=10))])
+    esperados = bot_editais.get_user_registry().active_count()
+    logger.info(f"Novo edital publicado. Disparando alerta para {esperados} usuário(s) ativo(s).")
+    inicio = time.perf_counter()
+    await bot_editais.verificar_novos_editais(application)
+    return {"esperados": esperados, "duracao": time.perf_counter() - inicio, "inicio": inicio}
+
+
+async def executar(args):
+    if not args.verbose:
+        logging.getLogger("bot_editais").setLevel(logging.WARNING)
+
+    rng = random.Random(args.seed)
+    chat_ids = list(range(PRIMEIRO_CHAT_ID, PRIMEIRO_CHAT_ID + args.usuarios))
+    linhas = preparar_dados(args.editais, chat_ids)
+    numeros = [l["numero_chamada"] for l in linhas]
+
+    registro = RegistroLatencias()
+    stub = StubTelegramAPI(on_message=registro.mensagem_recebida)
+    stub.start()
+    logger.info(f"Bot API falsa em {stub.base_url}")
+
+    processor = bot_editais.ChatUpdateProcessor(bot_editais.MAX_CONCURRENT_UPDATES, bot_editais.MAX_PENDING_PER_CHAT,
+                                                on_discard=registro.update_descartado)
+    application = bot_editais.build_application(TOKEN, base_url=stub.base_url, update_processor=processor)
+    async with application:
+        await application.start()
+        await application.updater.start_polling(poll_interval=0.0, timeout=5)
+
+        inicio = time.perf_counter()
+        tarefa_alerta = asyncio.create_task(disparar_alerta(application, linhas, args))
+        await gerar_carga(stub, registro, args, chat_ids, numeros, rng)
+        fim_carga = time.perf_counter()
+        alerta = await tarefa_alerta
+
+        # Aguarda as respostas restantes antes de contar o que foi perdido
+        limite = time.perf_counter() + args.espera_final
+        while time.perf_counter() < limite and (registro.pendentes() or stub.pending_updates()):
+            await asyncio.sleep(0.2)
+
+        stats = processor.stats()
+        await application.updater.stop()
+        await application.stop()
+    stub.close()
+
+    relatorio(args, registro, stub, alerta, stats, fim_carga - inicio)
+
+
+def relatorio(args, registro, stub, alerta, stats, duracao_carga):
+    sem_resposta = registro.sem_resposta()
+    coalescidos, throttle = registro.descartados["coalescido"], registro.descartados["throttle"]
+    enviados = sum(registro.enviados.values())
+    todas = sorted(l for ls in registro.latencias.values() for l in ls)
+
+    print()
+    print(f"=== Teste de carga: {args.usuarios} usuários, {args.taxa:g} comandos/s, {args.duracao:g}s ===")
+    print(f"Comandos enviados: {enviados} ({enviados / duracao_carga:.1f}/s efetivos)")
+    print()
+    print(f"{'comando':<14}{'enviados':>10}{'respostas':>11}{'p50 (ms)':>11}{'p95 (ms)':>11}{'p99 (ms)':>11}"
+          f"{'coalesc.':>10}{'throttle':>10}{'sem resp.':>11}")
+    linhas = sorted(registro.enviados) + ["TOTAL"]
+    for comando in linhas:
+        if comando == "TOTAL":
+            valores, n_env = todas, enviados
+            n_coal, n_thr, n_sem = sum(coalescidos.values()), sum(throttle.values()), sum(sem_resposta.values())
+        else:
+            valores = sorted(registro.latencias.get(comando, []))
+            n_env = registro.enviados[comando]
+            n_coal, n_thr, n_sem = coalescidos.get(comando, 0), throttle.get(comando, 0), sem_resposta.get(comando, 0)
+        print(f"{comando:<14}{n_env:>10}{len(valores):>11}"
+              f"{percentil(valores, 50) * 1000:>11.1f}{percentil(valores, 95) * 1000:>11.1f}"
+              f"{percentil(valores, 99) * 1000:>11.1f}{n_coal:>10}{n_thr:>10}{n_sem:>11}")
+    print()
+    descartados = stats['coalescidos'] + stats['descartados_throttle']
+    print(f"Updates descartados pelo bot: {descartados} "
+          f"(coalescidos: {stats['coalescidos']} | throttle: {stats['descartados_throttle']})")
+    print(f"Comandos sem resposta após {args.espera_final:g}s de espera final: {sum(sem_resposta.values())}")
+    print(f"Updates nunca buscados pelo bot: {stub.pending_updates()}")
+    if registro.respostas_sem_comando:
+        print(f"Respostas sem comando pendente no chat: {registro.respostas_sem_comando}")
+    print()
+    print(f"Alerta: {registro.alertas_recebidos}/{alerta['esperados']} entregues, "
+          f"envio concluído em {alerta['duracao']:.2f}s")
+    if registro.ultimo_alerta is not None:
+        print(f"  último alerta recebido {registro.ultimo_alerta - alerta['inicio']:.2f}s após o disparo")
+    print(f"Requisições à Bot API: {dict(stub.requests)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do bot_editais contra uma Bot API local.")
+    parser.add_argument("--usuarios", type=int, default=2000, help="Quantidade de usuários simulados.")
+    parser.add_argument("--taxa", type=float, default=100, help="Comandos por segundo (somando todos os usuários).")
+    parser.add_argument("--duracao", type=float, default=30, help="Duração da geração de carga, em segundos.")
+    parser.add_argument("--alerta-em", type=float, default=15, help="Segundos até publicar um novo edital e disparar o alerta.")
+    parser.add_argument("--mix", default=MIX_PADRAO, help=f"Pesos dos comandos (padrão: {MIX_PADRAO}).")
+    parser.add_argument("--editais", type=int, default=40, help="Quantidade de editais na camada gold sintética.")
+    parser.add_argument("--espera-final", type=float, default=10, help="Segundos aguardando respostas após o fim da carga.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="Mostra o log INFO do bot.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    # O bot usa caminhos relativos (./data/...), então o teste roda num diretório temporário
+    diretorio_original = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="load_test_bot_") as workdir:
+        os.chdir(workdir)
+        try:
+            asyncio.run(executar(args))
+        finally:
+            os.chdir(diretorio_original)
+
+
+if __name__ == "__main__":
+    main()
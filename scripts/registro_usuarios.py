@@ -0,0 +1,213 @@
+"""Registro compacto de usuários do bot.
+
+Os chat IDs ficam num array int64 ordenado e o estado (ativo/inativo) num bitmap
+com 1 bit por usuário, ocupando ~8,1 bytes por usuário, contra centenas de bytes
+do antigo dict[str, bool] carregado do JSON.
+
+Usuários novos entram primeiro num buffer pequeno e são incorporados aos arrays
+em lote, para que cada /start não precise realocar o array inteiro.
+"""
+
+import json
+import logging
+import os
+import struct
+from pathlib import Path
+
+import numpy as np
+
+# logger
+logger = logging.getLogger(__name__)
+
+# Formato do snapshot: cabeçalho (magic, versão, quantidade) + ids int64 LE + bitmap
+SNAPSHOT_MAGIC = b"EDUR"
+SNAPSHOT_VERSION = 1
+_HEADER = struct.Struct("<4sIQ")
+
+MERGE_THRESHOLD = 4096 # Usuários novos acumulados antes de incorporar aos arrays
+DEFAULT_CHUNK_SIZE = 8192 # Deve ser múltiplo de 8 (um byte do bitmap)
+
+
+class UserRegistry:
+    """Conjunto de chat IDs com uma flag de ativo por usuário."""
+
+    def __init__(self, ids=None, bitmap=None):
+        self._ids = ids if ids is not None else np.empty(0, dtype=np.int64)
+        self._bitmap = bitmap if bitmap is not None else np.zeros((len(self._ids) + 7) // 8, dtype=np.uint8)
+        self._pending = {} # chat_id -> ativo, ainda fora dos arrays
+
+    # --- Construção ---
+
+    @classmethod
+    def from_arrays(cls, ids, active):
+        """Cria o registro a partir de IDs (em qualquer ordem) e flags de ativo.
+
+        Em IDs repetidos vale a última ocorrência.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        active = np.asarray(active, dtype=bool)
+        # Inverte antes do unique para que a última ocorrência de cada ID prevaleça
+        ids_unicos, posicoes = np.unique(ids[::-1], return_index=True)
+        ativos = active[::-1][posicoes]
+        return cls(ids_unicos, np.packbits(ativos, bitorder='little'))
+
+    @classmethod
+    def from_dict(cls, users_dict):
+        """Cria o registro a partir do formato antigo {chat_id (str): ativo (bool)}."""
+        ids = np.fromiter((int(k) for k in users_dict), dtype=np.int64, count=len(users_dict))
+        active = np.fromiter((bool(v) for v in users_dict.values()), dtype=bool, count=len(users_dict))
+        return cls.from_arrays(ids, active)
+
+    # --- Consulta ---
+
+    def _index(self, chat_id):
+        """Posição de chat_id nos arrays, ou -1 se não estiver neles."""
+        i = int(np.searchsorted(self._ids, chat_id))
+        if i < len(self._ids) and self._ids[i] == chat_id:
+            return i
+        return -1
+
+    def _get_bit(self, i):
+        return bool(self._bitmap[i >> 3] & (1 << (i & 7)))
+
+    def _set_bit(self, i, active):
+        if active:
+            self._bitmap[i >> 3] |= np.uint8(1 << (i & 7))
+        else:
+            self._bitmap[i >> 3] &= np.uint8(~(1 << (i & 7)) & 0xFF)
+
+    def __len__(self):
+        return len(self._ids) + len(self._pending)
+
+    def __contains__(self, chat_id):
+        chat_id = int(chat_id)
+        return chat_id in self._pending or self._index(chat_id) >= 0
+
+    def is_active(self, chat_id):
+        """Retorna True se o usuário existe e está ativo."""
+        chat_id = int(chat_id)
+        if chat_id in self._pending:
+            return self._pending[chat_id]
+        i = self._index(chat_id)
+        return i >= 0 and self._get_bit(i)
+
+    def active_count(self):
+        """Quantidade de usuários ativos."""
+        total = int(np.unpackbits(self._bitmap, bitorder='little', count=len(self._ids)).sum())
+        return total + sum(1 for ativo in self._pending.values() if ativo)
+
+    # --- Alteração ---
+
+    def set_active(self, chat_id, active=True):
+        """Marca o usuário como ativo/inativo, adicionando-o se ainda não existir.
+
+        Returns:
+            bool | None: Estado anterior do usuário, ou None se ele é novo.
+        """
+        chat_id = int(chat_id)
+        if chat_id in self._pending:
+            anterior = self._pending[chat_id]
+            self._pending[chat_id] = active
+            return anterior
+        i = self._index(chat_id)
+        if i >= 0:
+            anterior = self._get_bit(i)
+            self._set_bit(i, active)
+            return anterior
+        self._pending[chat_id] = active
+        if len(self._pending) >= MERGE_THRESHOLD:
+            self._merge_pending()
+        return None
+
+    def _merge_pending(self):
+        """Incorpora o buffer de usuários novos aos arrays ordenados (O(n + k))."""
+        if not self._pending:
+            return
+        novos_ids = np.fromiter(self._pending.keys(), dtype=np.int64, count=len(self._pending))
+        novos_ativos = np.fromiter(self._pending.values(), dtype=bool, count=len(self._pending))
+        ordem = np.argsort(novos_ids)
+        novos_ids, novos_ativos = novos_ids[ordem], novos_ativos[ordem]
+
+        posicoes = np.searchsorted(self._ids, novos_ids)
+        ativos = np.unpackbits(self._bitmap, bitorder='little', count=len(self._ids)).astype(bool)
+        self._ids = np.insert(self._ids, posicoes, novos_ids)
+        self._bitmap = np.packbits(np.insert(ativos, posicoes, novos_ativos), bitorder='little')
+        self._pending = {}
+
+    # --- Iteração ---
+
+    def iter_active_chunks(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Itera sobre os IDs ativos em blocos (arrays int64), para envio em massa.
+
+        A iteração usa uma cópia do estado no momento da chamada: mudanças feitas
+        durante o envio valem para a próxima iteração.
+        """
+        if chunk_size % 8:
+            raise ValueError("chunk_size deve ser múltiplo de 8")
+        self._merge_pending()
+        ids, bitmap = self._ids, self._bitmap.copy()
+        for inicio in range(0, len(ids), chunk_size):
+            bloco = ids[inicio:inicio + chunk_size]
+            bits = np.unpackbits(bitmap[inicio // 8:(inicio + chunk_size) // 8], bitorder='little', count=len(bloco))
+            ativos = bloco[bits.astype(bool)]
+            if len(ativos):
+                yield ativos
+
+    # --- Persistência ---
+
+    def save(self, path):
+        """Salva o snapshot binário de forma atômica (arquivo temporário + rename)."""
+        self._merge_pending()
+        path = Path(path)
+        temporario = path.with_suffix(path.suffix + ".tmp")
+        with open(temporario, "wb") as f:
+            f.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(self._ids)))
+            f.write(self._ids.astype("<i8", copy=False).tobytes())
+            f.write(self._bitmap.tobytes())
+        os.replace(temporario, path)
+
+    @classmethod
+    def load(cls, path):
+        """Carrega um snapshot salvo com save().
+
+        Raises:
+            ValueError: Se o arquivo não for um snapshot válido.
+        """
+        with open(path, "rb") as f:
+            magic, versao, n = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != SNAPSHOT_MAGIC or versao != SNAPSHOT_VERSION:
+                raise ValueError(f"{path} não é um snapshot de usuários válido (versão {versao})")
+            ids = np.fromfile(f, dtype="<i8", count=n).astype(np.int64, copy=False)
+            bitmap = np.fromfile(f, dtype=np.uint8, count=(n + 7) // 8)
+        if len(ids) != n or len(bitmap) != (n + 7) // 8:
+            raise ValueError(f"Snapshot de usuários {path} truncado")
+        return cls(ids, bitmap)
+
+
+def load_registry(snapshot_path, legacy_json_path=None):
+    """Carrega o registro do snapshot, migrando do JSON antigo se o snapshot não existir.
+
+    Returns:
+        UserRegistry: Registro carregado (vazio apenas se nenhum dos arquivos existir).
+
+    Raises:
+        OSError, ValueError: Se um arquivo existe mas não pode ser lido. Não se começa
+            com um registro vazio nesse caso, porque o próximo salvamento sobrescreveria
+            o arquivo e todos os inscritos seriam perdidos.
+    """
+    if os.path.exists(snapshot_path):
+        try:
+            return UserRegistry.load(snapshot_path)
+        except (OSError, ValueError, struct.error) as e:
+            logger.critical(f"Snapshot de usuários {snapshot_path} ilegível: {e}. Restaure ou remova o arquivo.")
+            raise ValueError(f"Snapshot de usuários {snapshot_path} ilegível: {e}") from e
+    if legacy_json_path and os.path.exists(legacy_json_path):
+        try:
+            with open(legacy_json_path, "r", encoding='utf-8') as f:
+                registry = UserRegistry.from_dict(json.load(f))
+        except (json.JSONDecodeError, IOError, ValueError) as e:
+            logger.critical(f"JSON de usuários {legacy_json_path} ilegível: {e}. Restaure ou remova o arquivo.")
+            raise ValueError(f"JSON de usuários {legacy_json_path} ilegível: {e}") from e
+        logger.info(f"Usuários migrados de {legacy_json_path}: {len(registry)} registro(s).")
+        return registry
+    return UserRegistry()
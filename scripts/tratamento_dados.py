@@ -15,7 +15,14 @@ output_dir = Path("./data/")
 # Lista os arquivos brutos
 parquet_file = sorted(input_dir.glob("chamadas_bolsas_ipea_bronze.parquet"))
 
-def processar_parquet(file_path: Path):
+def processar_parquet(file_path: Path, dt_referencia=None):
+    """Gera as camadas silver e gold a partir da bronze.
+
+    Args:
+        file_path (Path): Arquivo da camada bronze.
+        dt_referencia (datetime, optional): Data usada como "hoje" no cálculo de editais abertos.
+            Se None, usa o momento atual. Fixar a data torna a saída reprodutível (backfill).
+    """
     try:
         logger.info(f"Processando: {file_path}")
 
@@ -41,7 +48,7 @@ def processar_parquet(file_path: Path):
         # Criando novas colunas
         df[['dt_inicio', 'dt_fim']] = df['periodo_inscricao'].str.split(' à ', expand=True)
         #df['dt_hoje'] = pd.to_datetime(datetime.date.today())
-        df['dt_hoje'] = pd.to_datetime(datetime.datetime.now())
+        df['dt_hoje'] = pd.to_datetime(dt_referencia or datetime.datetime.now())
 
         # Converter para datetime se desejar
         df['dt_inicio'] = pd.to_datetime(df['dt_inicio'], format='%d/%m/%Y')
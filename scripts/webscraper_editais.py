@@ -3,9 +3,19 @@ from bs4 import BeautifulSoup
 import pandas as pd
 from pathlib import Path
 import re
+import sys
+import time
+import gzip
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
 import pyarrow as pa
 import pyarrow.parquet as pq
 import logging
+from dataclasses import dataclass
+from typing import Callable
 
 # logger
 logger = logging.getLogger(__name__)
@@ -17,140 +27,409 @@ output_dir.mkdir(parents=True, exist_ok=True)
 # Arquivo de saída
 output_path = output_dir / f"chamadas_bolsas_ipea_bronze.parquet"
 
+# Arquivo das páginas coletadas (gzip, endereçado pelo sha256 do conteúdo) e índice das coletas
+archive_dir = output_dir / "html_archive"
+archive_index_path = archive_dir / "index.jsonl"
+_archive_lock = threading.Lock() # As fontes são coletadas em threads e dividem o mesmo índice
 
-# Funções principais
-def extrair_dados_ipea(url):
-    """Extrai dados das chamadas públicas da página de bolsas do IPEA.
+# Colunas da camada bronze (todas as fontes devem produzir exatamente estas)
+BRONZE_COLUMNS = ['numero_chamada', 'ano_chamada', 'link_chamada', 'programa', 'periodo_inscricao', 'fonte']
+CHAVE_CHAMADA = ['fonte', 'ano_chamada', 'numero_chamada'] # Identifica uma chamada na camada bronze
+DEFAULT_FONTE = "ipea_bolsas" # Fonte assumida para camadas bronze gravadas antes da coluna 'fonte'
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+
+# --- Fontes ---
+
+@dataclass(frozen=True)
+class Fonte:
+    """Uma página de chamadas a ser coletada.
+
+    Attributes:
+        nome (str): Identificador da fonte, gravado na coluna 'fonte' da camada bronze.
+        url (str): URL da página de chamadas.
+        parser (Callable[[str, str], list[dict]]): Função que recebe o HTML e a URL base
+            e devolve uma lista de registros com as colunas da camada bronze (exceto 'fonte').
+        base_url (str): Prefixo usado para completar links relativos.
+        timeout (float): Tempo máximo, em segundos, para a coleta desta fonte dentro do ciclo.
+    """
+    nome: str
+    url: str
+    parser: Callable[[str, str], list]
+    base_url: str = ""
+    timeout: float = 120
+
+
+def extrair_numero_ano(titulo_texto):
+    """Extrai número e ano de um título de chamada (ex: 'Chamada Pública nº 12/2024').
+
+    Returns:
+        tuple: (numero, ano) como strings, ou (None, None) se nenhum padrão casar.
+    """
+    if not titulo_texto:
+        return None, None
+    match = re.search(r'nº\s*(\d+)/(\d{4})', titulo_texto) # padrão 1: nº XXX/YYYY
+    if not match: # Se primeiro padrão falhar, tentar padrão primeiro alternativo
+        match = re.search(r'Chamada Pública\s*(\d+)/(\d{4})', titulo_texto) # padrão 2: Chamada Pública XXX/YYYY
+    if not match: # Se segundo padrão falhar, tentar fallback amplo
+         match = re.search(r'(\d+)/(\d{4})', titulo_texto) # padrão 3: XXX/YYYY
+    if match:
+        return match.group(1), match.group(2)
+    return None, None
+
+
+def parse_ipea_bolsas(html, base_url="https://www.ipea.gov.br"):
+    """Parser da página de bolsas de pesquisa do IPEA.
 
     Args:
-        url (str): A URL da página de bolsas do IPEA.
+        html (str): Conteúdo HTML da página.
+        base_url (str): Prefixo para links relativos.
 
     Returns:
-        pandas.DataFrame: DataFrame com os dados extraídos ou None se ocorrer erro.
+        list[dict]: Registros extraídos (lista vazia se nada for encontrado).
     """
     dados_chamadas = []
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
+    soup = BeautifulSoup(html, 'html.parser')
 
-    try:
-        response = requests.get(url, headers=headers, timeout=120)
+    # Encontra a lista principal que contém as chamadas
+    lista_chamadas = soup.find('div', id='resultado_busca_ajax')
+    if not lista_chamadas:
+        logger.warning("Container #resultado_busca_ajax não encontrado. Tentando fallback com classe antiga.")
+        # Tentativa com a classe da imagem original, caso a estrutura varie
+        lista_chamadas = soup.find('ul', class_='search-resultsbolsas list-striped')
+        if not lista_chamadas:
+            logger.error("Não foi possível localizar nenhum container de chamadas.")
+            return []
+        itens = lista_chamadas.find_all('li')
+    else:
+         # A estrutura atual parece usar divs dentro do #resultado_busca_ajax
+         itens = lista_chamadas.find_all('div', class_='search-item-wrap', recursive=False)
+
+    if not itens:
+        logger.warning("Nenhum item de chamada encontrado dentro do container.")
+        return []
+
+    logger.info(f"Encontrados {len(itens)} itens de chamada. Começando a extrair os dados de interesse")
+
+    for item in itens:
+        numero_chamada = None
+        ano_chamada = None
+        link_chamada = None
+        programa = None
+        periodo_inscricao = None
+
+        # --- Extração do Título, Link, Número e Ano ---
+        titulo_tag = item.find('h4', class_='result-title')
+        if titulo_tag and titulo_tag.find('a'):
+            link_tag = titulo_tag.find('a')
+            titulo_texto = link_tag.get_text(strip=True)
+            link_chamada = link_tag.get('href')
+            if link_chamada and not link_chamada.startswith('http'):
+                link_chamada = base_url + link_chamada
+
+            # Extrair número e ano do título apenas se titulo_texto for valido
+            numero_chamada, ano_chamada = extrair_numero_ano(titulo_texto)
+
+        # --- Extração dos outros campos (baseado na estrutura da imagem e inspeção) ---
+        # A estrutura real pode usar <p> ou <div> para os detalhes
+        paragrafos = item.find_all('p')
+        if not paragrafos:
+             # Se não houver <p>, tentar com <div> dentro do item
+             paragrafos = item.find_all('div') # Ajuste genérico
+
+        for p in paragrafos:
+            strong_tag = p.find('strong')
+            if strong_tag:
+                campo = strong_tag.get_text(strip=True).lower()
+                valor = strong_tag.next_sibling
+                if valor:
+                     valor = valor.strip()
+                     if 'programa:' in campo:
+                         programa = valor
+                     elif 'prazo de inscrição:' in campo:
+                         periodo_inscricao = valor
+                     elif 'ano:' in campo and not ano_chamada:
+                         # Pega o ano daqui se não conseguiu do título
+                         ano_chamada = valor
+
+        # Adiciona os dados extraídos à lista
+        dados_chamadas.append({
+            'numero_chamada': numero_chamada,
+            'ano_chamada': ano_chamada,
+            'link_chamada': link_chamada,
+            'programa': programa,
+            'periodo_inscricao': periodo_inscricao
+        })
+
+    return dados_chamadas
+
+
+# Registro de fontes coletadas a cada ciclo. Para acompanhar outra página ou
+# instituição, basta escrever um parser com a mesma assinatura e adicioná-la aqui.
+FONTES = [
+    Fonte(
+        nome="ipea_bolsas",
+        url="https://www.ipea.gov.br/portal/bolsas-de-pesquisa",
+        parser=parse_ipea_bolsas,
+        base_url="https://www.ipea.gov.br",
+    ),
+]
+
+
+def buscar_fonte(fonte):
+    """Baixa o HTML de uma fonte, respeitando fonte.timeout para o download inteiro.
+
+    O timeout do requests vale para cada operação de socket, então um site que
+    envia os dados aos poucos poderia passar muito do prazo; por isso o corpo é
+    lido em blocos e o tempo total é verificado a cada bloco.
+
+    Returns:
+        str: Conteúdo HTML da página.
+
+    Raises:
+        requests.exceptions.RequestException: Se houver erro de rede ou HTTP, ou se o prazo total estourar.
+    """
+    inicio = time.monotonic()
+    with requests.get(fonte.url, headers=HEADERS, timeout=fonte.timeout, stream=True) as response:
         response.raise_for_status() # Verifica se houve erro HTTP
-        soup = BeautifulSoup(response.text, 'html.parser')
+        partes = []
+        for parte in response.iter_content(chunk_size=64 * 1024):
+            partes.append(parte)
+            if time.monotonic() - inicio > fonte.timeout:
+                raise requests.exceptions.Timeout(f"Download excedeu {fonte.timeout}s")
+        encoding = response.encoding or response.apparent_encoding or 'utf-8'
+    return b"".join(partes).decode(encoding, errors='replace')
 
-        # Encontra a lista principal que contém as chamadas
 
-        lista_chamadas = soup.find('div', id='resultado_busca_ajax')
-        if not lista_chamadas:
-            logger.warning("Container #resultado_busca_ajax não encontrado. Tentando fallback com classe antiga.")
-            # Tentativa com a classe da imagem original, caso a estrutura varie
-            lista_chamadas = soup.find('ul', class_='search-resultsbolsas list-striped')
-            if not lista_chamadas:
-                logger.error("Não foi possível localizar nenhum container de chamadas.")
-                return None
-            itens = lista_chamadas.find_all('li')
+def arquivar_html(fonte, html, coletado_em=None):
+    """Guarda o HTML coletado no arquivo e registra a coleta no índice.
+
+    O arquivo é endereçado pelo sha256 do conteúdo, então a mesma página coletada
+    várias vezes é gravada uma única vez; o índice guarda todas as coletas.
+
+    Returns:
+        str: sha256 do conteúdo.
+    """
+    conteudo = html.encode('utf-8')
+    sha = hashlib.sha256(conteudo).hexdigest()
+    destino = archive_dir / fonte.nome / sha[:2] / f"{sha}.html.gz"
+    coletado_em = coletado_em or datetime.now(timezone.utc).isoformat()
+
+    with _archive_lock:
+        if not destino.exists():
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            temporario = destino.with_suffix(".tmp")
+            # mtime=0 deixa o .gz idêntico para o mesmo conteúdo
+            with gzip.GzipFile(temporario, 'wb', mtime=0) as f:
+                f.write(conteudo)
+            os.replace(temporario, destino)
+        with open(archive_index_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'sha256': sha, 'fonte': fonte.nome, 'url': fonte.url, 'coletado_em': coletado_em}) + "\n")
+    return sha
+
+
+def carregar_indice_arquivo():
+    """Lê o índice de coletas arquivadas.
+
+    Returns:
+        list[dict]: Entradas do índice (linhas inválidas são ignoradas com aviso).
+    """
+    if not archive_index_path.exists():
+        return []
+    entradas = []
+    with open(archive_index_path, 'r', encoding='utf-8') as f:
+        for numero_linha, linha in enumerate(f, start=1):
+            try:
+                entradas.append(json.loads(linha))
+            except json.JSONDecodeError:
+                logger.warning(f"Linha {numero_linha} do índice do arquivo inválida. Ignorando.")
+    return entradas
+
+
+def parsear_snapshot(fonte_nome, sha):
+    """Reparseia uma página arquivada com o parser atual da fonte.
+
+    Executado nos processos do backfill, por isso recebe apenas valores simples.
+
+    Returns:
+        tuple: (registros extraídos, tamanho do HTML em bytes).
+    """
+    fonte = {f.nome: f for f in FONTES}[fonte_nome]
+    with gzip.open(archive_dir / fonte_nome / sha[:2] / f"{sha}.html.gz", 'rb') as f:
+        conteudo = f.read()
+    df = parsear_fonte(fonte, conteudo.decode('utf-8'))
+    return df.to_dict('records'), len(conteudo)
+
+
+def parsear_fonte(fonte, html):
+    """Aplica o parser da fonte ao HTML e devolve um DataFrame no esquema bronze."""
+    registros = fonte.parser(html, fonte.base_url)
+    df = pd.DataFrame(registros, columns=BRONZE_COLUMNS[:-1])
+    df['fonte'] = fonte.nome
+    return df
+
+
+def coletar_fonte(fonte):
+    """Baixa e parseia uma fonte. Executado em uma thread por fonte."""
+    inicio = time.monotonic()
+    html = buscar_fonte(fonte)
+    try:
+        arquivar_html(fonte, html)
+    except OSError as e:
+        # Falha ao arquivar não impede a coleta
+        logger.error(f"[{fonte.nome}] Erro ao arquivar o HTML: {e}")
+    df = parsear_fonte(fonte, html)
+    logger.info(f"[{fonte.nome}] {len(df)} chamada(s) coletada(s) em {time.monotonic() - inicio:.1f}s")
+    return df
+
+
+def validar_registros(df, nome_fonte):
+    """Descarta linhas sem número de chamada válido e padroniza a coluna como inteiro.
+
+    Feito por fonte, antes de juntar os dados, para que linhas ruins de uma fonte
+    não impeçam o salvamento das demais.
+    """
+    numeros = pd.to_numeric(df['numero_chamada'], errors='coerce')
+    invalidos = numeros.isna()
+    if invalidos.any():
+        logger.warning(f"[{nome_fonte}] {int(invalidos.sum())} registro(s) sem número de chamada válido descartado(s).")
+    df = df[~invalidos].copy()
+    df['numero_chamada'] = numeros[~invalidos].astype(int)
+    return df
+
+
+def _coletar_em_thread(fonte, resultado):
+    try:
+        resultado['df'] = coletar_fonte(fonte)
+    except Exception as e:
+        resultado['erro'] = e
+
+
+def coletar_fontes(fontes=FONTES):
+    """Coleta todas as fontes concorrentemente, respeitando o timeout de cada uma.
+
+    Uma fonte lenta ou com erro é registrada no log e descartada, sem impedir
+    que as demais sejam salvas no ciclo.
+
+    Returns:
+        pandas.DataFrame: Dados de todas as fontes que responderam, ou None se nenhuma respondeu.
+    """
+    if not fontes:
+        logger.warning("Nenhuma fonte configurada.")
+        return None
+
+    # Threads daemon: uma fonte presa além do prazo não impede o processo de terminar
+    inicio = time.monotonic()
+    coletas = {}
+    for fonte in fontes:
+        resultado = {}
+        thread = threading.Thread(target=_coletar_em_thread, args=(fonte, resultado), name=f"fonte-{fonte.nome}", daemon=True)
+        thread.start()
+        coletas[fonte] = (thread, resultado)
+
+    dataframes = []
+    for fonte, (thread, resultado) in coletas.items():
+        # O prazo de cada fonte conta a partir do início do ciclo, não do fim da anterior
+        thread.join(max(0.0, fonte.timeout - (time.monotonic() - inicio)))
+        erro = resultado.get('erro')
+        if thread.is_alive():
+            logger.error(f"[{fonte.nome}] Timeout de {fonte.timeout}s excedido. Fonte ignorada neste ciclo.")
+        elif isinstance(erro, requests.exceptions.RequestException):
+            logger.error(f"[{fonte.nome}] Erro ao acessar a URL: {erro}")
+        elif erro is not None:
+            logger.error(f"[{fonte.nome}] Ocorreu um erro inesperado: {erro}")
         else:
-             # A estrutura atual parece usar divs dentro do #resultado_busca_ajax
-             itens = lista_chamadas.find_all('div', class_='search-item-wrap', recursive=False)
-
-        if not itens:
-            logger.warning("Nenhum item de chamada encontrado dentro do container.")
-            return None
-
-        logger.info(f"Encontrados {len(itens)} itens de chamada. Começando a extrair os dados de interesse")
-
-        for item in itens:
-            numero_chamada = None
-            ano_chamada = None
-            link_chamada = None
-            programa = None
-            periodo_inscricao = None
-            base_url = "https://www.ipea.gov.br"
-
-            # --- Extração do Título, Link, Número e Ano ---
-            titulo_tag = item.find('h4', class_='result-title')
-            titulo_texto = None 
-            if titulo_tag and titulo_tag.find('a'):
-                link_tag = titulo_tag.find('a')
-                titulo_texto = link_tag.get_text(strip=True)
-                link_chamada = link_tag.get('href')
-                if link_chamada and not link_chamada.startswith('http'):
-                    link_chamada = base_url + link_chamada
-
-                # Extrair número e ano do título apenas se titulo_texto for valido
-                if titulo_texto:
-                    match = re.search(r'nº\s*(\d+)/(\d{4})', titulo_texto) # padrão 1: nº XXX/YYYY
-                    if not match: # Se primeiro padrão falhar, tentar padrão primeiro alternativo
-                        match = re.search(r'Chamada Pública\s*(\d+)/(\d{4})', titulo_texto) # padrão 2: Chamada Pública XXX/YYYY
-                    if not match: # Se segundo padrão falhar, tentar fallback amplo
-                         match = re.search(r'(\d+)/(\d{4})', titulo_texto) # padrão 3: XXX/YYYY
-
-                    if match: # Se existe alguma correspondência foi encontrada antes de acessar os grupos
-                        numero_chamada = match.group(1)
-                        ano_chamada = match.group(2)
-
-            # --- Extração dos outros campos (baseado na estrutura da imagem e inspeção) ---
-            # A estrutura real pode usar <p> ou <div> para os detalhes
-            paragrafos = item.find_all('p')
-            if not paragrafos:
-                 # Se não houver <p>, tentar com <div> dentro do item
-                 paragrafos = item.find_all('div') # Ajuste genérico
-
-            for p in paragrafos:
-                strong_tag = p.find('strong')
-                if strong_tag:
-                    campo = strong_tag.get_text(strip=True).lower()
-                    valor = strong_tag.next_sibling
-                    if valor:
-                         valor = valor.strip()
-                         if 'programa:' in campo:
-                             programa = valor
-                         elif 'prazo de inscrição:' in campo:
-                             periodo_inscricao = valor
-                         elif 'ano:' in campo and not ano_chamada:
-                             # Pega o ano daqui se não conseguiu do título
-                             ano_chamada = valor
-
-            # Adiciona os dados extraídos à lista
-            dados_chamadas.append({
-                'numero_chamada': numero_chamada,
-                'ano_chamada': ano_chamada,
-                'link_chamada': link_chamada,
-                'programa': programa,
-                'periodo_inscricao': periodo_inscricao
-            })
-
-        # Cria o DataFrame
-        df = pd.DataFrame(dados_chamadas)
-        return df
-
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Erro ao acessar a URL: {e}")
+            dataframes.append(validar_registros(resultado['df'], fonte.nome))
+
+    dataframes = [df for df in dataframes if not df.empty]
+    if not dataframes:
+        return None
+    return pd.concat(dataframes, ignore_index=True)
+
+
+def consolidar_chamadas(df):
+    """Mantém uma linha por chamada (a última em que ela aparece em df) e ordena o resultado.
+
+    A camada bronze é o histórico de todas as chamadas já coletadas, com os dados da
+    coleta mais recente de cada uma; tanto o ciclo normal quanto o backfill a gravam
+    por meio desta função.
+    """
+    df = df.drop_duplicates(subset=CHAVE_CHAMADA, keep='last')
+    df = df.sort_values(CHAVE_CHAMADA, kind='mergesort')
+    return df.reset_index(drop=True)
+
+
+def carregar_bronze():
+    """Lê a camada bronze atual.
+
+    Returns:
+        pandas.DataFrame: Dados no esquema bronze, ou None se o arquivo não existir ou estiver ilegível.
+    """
+    if not output_path.exists():
         return None
+    try:
+        df = pd.read_parquet(output_path)
     except Exception as e:
-        logger.error(f"Ocorreu um erro inesperado: {e}")
+        logger.error(f"Erro ao ler a camada bronze {output_path}: {e}")
         return None
+    df = df.reindex(columns=BRONZE_COLUMNS)
+    df['fonte'] = df['fonte'].fillna(DEFAULT_FONTE)
+    return df
 
 
+# Funções principais
+def parsear_fixture(nome_fonte, html_path):
+    """Parseia um HTML gravado localmente com o parser da fonte indicada (sem acesso à rede).
 
-def run():
-    url_ipea_bolsas = "https://www.ipea.gov.br/portal/bolsas-de-pesquisa"
-    logger.info(f"Iniciando scraping da URL: {url_ipea_bolsas}")
-    dataframe_chamadas = extrair_dados_ipea(url_ipea_bolsas)
+    Args:
+        nome_fonte (str): Nome de uma fonte registrada em FONTES.
+        html_path (str | Path): Caminho do arquivo HTML gravado.
 
-    if dataframe_chamadas is not None:
-        logger.info("Preparando para salvar")
-        logger.info(f"\n{dataframe_chamadas}")
+    Returns:
+        pandas.DataFrame: Dados extraídos no esquema bronze.
+    """
+    fontes = {fonte.nome: fonte for fonte in FONTES}
+    if nome_fonte not in fontes:
+        raise ValueError(f"Fonte '{nome_fonte}' desconhecida. Disponíveis: {', '.join(fontes)}")
+    html = Path(html_path).read_text(encoding='utf-8')
+    return parsear_fonte(fontes[nome_fonte], html)
+
+
+def salvar_bronze(dataframe_chamadas):
+    """Padroniza e salva o DataFrame na camada bronze.
 
+    Returns:
+        bool: True se o arquivo foi salvo.
+    """
+    try:
         # Patronizando a coluna númerica da chamada
         dataframe_chamadas["numero_chamada"] = dataframe_chamadas["numero_chamada"].astype(int)
 
         # Salvar em parquet
-        try:
-            pq.write_table(pa.Table.from_pandas(dataframe_chamadas), output_path)
-            logger.info("Dataframe salvo com sucesso em 'chamadas_bolsas_ipea_bronze.parquet'")
-        except Exception as e:
-            logger.error(f"Erro ao salvar o dataframe em .parquet: {e}")
+        pq.write_table(pa.Table.from_pandas(dataframe_chamadas), output_path)
+        logger.info("Dataframe salvo com sucesso em 'chamadas_bolsas_ipea_bronze.parquet'")
+        return True
+    except Exception as e:
+        logger.error(f"Erro ao salvar o dataframe em .parquet: {e}")
+        return False
+
+
+def run():
+    logger.info(f"Iniciando scraping de {len(FONTES)} fonte(s): {', '.join(f.nome for f in FONTES)}")
+    dataframe_chamadas = coletar_fontes(FONTES)
+
+    if dataframe_chamadas is not None:
+        historico = carregar_bronze()
+        if historico is not None:
+            # A coleta atual vem por último e prevalece sobre o histórico
+            dataframe_chamadas = pd.concat([historico, dataframe_chamadas], ignore_index=True)
+        dataframe_chamadas = consolidar_chamadas(dataframe_chamadas)
+        logger.info("Preparando para salvar")
+        logger.info(f"\n{dataframe_chamadas}")
+        salvar_bronze(dataframe_chamadas)
     else:
         logger.warning("Não foi possível gerar o dataframe.")
 
@@ -161,5 +440,8 @@ def main():
 # --- Execução ---
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
-    main()
-
+    # Uso offline: python webscraper_editais.py <fonte> <arquivo.html>
+    if len(sys.argv) == 3:
+        print(parsear_fixture(sys.argv[1], sys.argv[2]))
+    else:
+        main()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Os scripts não formam um pacote; são importados pelo nome, como em run_update.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
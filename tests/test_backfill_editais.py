@@ -0,0 +1,75 @@
+from pathlib import Path
+
+import pandas as pd
+
+import backfill_editais
+import webscraper_editais
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def test_parsear_snapshot_arquivado_e_falha_sem_excecao(tmp_path, monkeypatch):
+    monkeypatch.setattr(webscraper_editais, "archive_dir", tmp_path)
+    monkeypatch.setattr(webscraper_editais, "archive_index_path", tmp_path / "index.jsonl")
+    fonte = webscraper_editais.FONTES[0]
+    html = (FIXTURES / "ipea_bolsas_resultado_busca_ajax.html").read_text(encoding="utf-8")
+    sha = webscraper_editais.arquivar_html(fonte, html, "2026-01-01T00:00:00+00:00")
+
+    linhas, tamanho, erro = backfill_editais._parsear((fonte.nome, sha))
+    assert erro is None
+    assert tamanho == len(html.encode("utf-8"))
+    assert [l['numero_chamada'] for l in linhas[:3]] == ['12', '7', '3']
+    assert all(l['fonte'] == fonte.nome for l in linhas)
+
+    # Snapshot listado no índice mas ausente do disco: falha devolvida, não levantada
+    linhas, tamanho, erro = backfill_editais._parsear((fonte.nome, "0" * 64))
+    assert (linhas, tamanho) == ([], 0)
+    assert erro.startswith("FileNotFoundError")
+
+
+def test_coleta_mais_recente_prevalece_e_saida_deterministica(tmp_path, monkeypatch):
+    monkeypatch.setattr(webscraper_editais, "archive_dir", tmp_path)
+    monkeypatch.setattr(webscraper_editais, "archive_index_path", tmp_path / "index.jsonl")
+    fonte = webscraper_editais.FONTES[0]
+    antiga = (FIXTURES / "ipea_bolsas_resultado_busca_ajax.html").read_text(encoding="utf-8")
+    # Na versão nova o prazo da 12/2024 foi prorrogado e a 3/2023 saiu da página
+    nova = antiga.replace("01/03/2024 à 15/03/2024", "01/03/2024 à 30/03/2024")
+    nova = nova.replace("Seleção de bolsistas 3/2023", "Seleção de bolsistas")
+
+    # Índice fora de ordem: a versão nova é gravada antes da antiga
+    sha_nova = webscraper_editais.arquivar_html(fonte, nova, "2026-02-01T00:00:00+00:00")
+    sha_antiga = webscraper_editais.arquivar_html(fonte, antiga, "2026-01-01T00:00:00+00:00")
+    webscraper_editais.arquivar_html(fonte, antiga, "2025-12-01T00:00:00+00:00")
+
+    snapshots = backfill_editais.listar_snapshots()
+    assert snapshots == [
+        (fonte.nome, sha_antiga, "2026-01-01T00:00:00+00:00"),
+        (fonte.nome, sha_nova, "2026-02-01T00:00:00+00:00"),
+    ]
+
+    execucoes = [backfill_editais.consolidar_bronze(backfill_editais.reparsear_arquivo(snapshots, workers=2))
+                 for _ in range(2)]
+    pd.testing.assert_frame_equal(execucoes[0], execucoes[1])
+
+    bronze = execucoes[0].set_index(['ano_chamada', 'numero_chamada'])
+    assert list(execucoes[0].columns) == webscraper_editais.BRONZE_COLUMNS
+    assert bronze.loc[('2024', 12), 'periodo_inscricao'] == "01/03/2024 à 30/03/2024"
+    # Chamada que só aparece na versão antiga continua no histórico
+    assert ('2023', 3) in bronze.index
+    assert len(bronze) == 3
+
+
+def test_consolidar_bronze_aplica_validacao_do_ciclo_normal():
+    df = pd.DataFrame({
+        'numero_chamada': ['12', '12A', None, '7'],
+        'ano_chamada': ['2024', '2024', '2024', '2025'],
+        'link_chamada': ['a', 'b', 'c', 'd'],
+        'programa': [None] * 4,
+        'periodo_inscricao': [None] * 4,
+        'fonte': ['ipea_bolsas'] * 4,
+        'coletado_em': ['2026-01-01'] * 4,
+    })
+
+    bronze = backfill_editais.consolidar_bronze(df)
+    assert bronze['numero_chamada'].tolist() == [12, 7]
+    assert bronze['link_chamada'].tolist() == ['a', 'd']
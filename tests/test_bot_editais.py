@@ -0,0 +1,147 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pandas as pd
+from telegram import CallbackQuery, Chat, Message, Update, User
+
+import bot_editais
+from bot_editais import ChatUpdateProcessor
+from registro_usuarios import UserRegistry
+
+USUARIO = User(id=42, first_name="Teste", is_bot=False)
+CHAT = Chat(id=42, type="private")
+
+
+class BotFalso:
+    def __init__(self):
+        self.callbacks_respondidos = []
+
+    async def answer_callback_query(self, callback_query_id, **kwargs):
+        self.callbacks_respondidos.append(callback_query_id)
+        return True
+
+
+def mensagem(update_id, texto):
+    return Update(update_id, message=Message(update_id, datetime.now(), CHAT, from_user=USUARIO, text=texto))
+
+
+def callback(update_id, dados, bot):
+    query = CallbackQuery(str(update_id), USUARIO, "instancia", data=dados,
+                          message=Message(1, datetime.now(), CHAT, text="lista"))
+    query.set_bot(bot)
+    return Update(update_id, callback_query=query)
+
+
+async def processar(updates, max_pending_per_chat=10):
+    """Envia os updates como a Application faz (uma task por update) e retorna a ordem executada."""
+    processor = ChatUpdateProcessor(max_concurrent_updates=4, max_pending_per_chat=max_pending_per_chat)
+    executados = []
+    liberar = asyncio.Event()
+
+    async def handler(update):
+        await liberar.wait() # Segura a execução para que os demais fiquem na fila
+        executados.append(update.effective_message.text if update.message else update.callback_query.data)
+
+    tasks = []
+    for update in updates:
+        tasks.append(asyncio.create_task(processor.process_update(update, handler(update))))
+        await asyncio.sleep(0)
+    liberar.set()
+    await asyncio.gather(*tasks)
+    return executados, processor
+
+
+def test_comandos_de_estado_intercalados_rodam_todos():
+    executados, processor = asyncio.run(processar([mensagem(1, "/stop"), mensagem(2, "/start"), mensagem(3, "/stop")]))
+
+    assert executados == ["/stop", "/start", "/stop"]
+    assert processor.coalesced == 0
+
+
+def test_repeticao_do_ultimo_comando_pendente_e_coalescida():
+    executados, processor = asyncio.run(processar([mensagem(1, "/abertos"), mensagem(2, "/abertos"), mensagem(3, "/ajuda")]))
+
+    assert executados == ["/abertos", "/ajuda"]
+    assert processor.coalesced == 1
+    assert processor.stats()['chats_ativos'] == 0
+
+
+def test_chat_acima_do_limite_de_pendentes_e_descartado():
+    comandos = [mensagem(i, f"/link {i}") for i in range(1, 7)]
+    executados, processor = asyncio.run(processar(comandos, max_pending_per_chat=2))
+
+    # Com 4 vagas globais: 2 updates ficam pendentes no chat e os excedentes são descartados
+    assert executados == ["/link 1", "/link 2"]
+    assert processor.throttled == 4
+    assert processor.current_concurrent_updates == 0
+
+
+def test_callback_descartado_e_respondido():
+    bot = BotFalso()
+    executados, processor = asyncio.run(processar([callback(1, "abertos:1:1", bot), callback(2, "abertos:1:1", bot)]))
+
+    assert executados == ["abertos:1:1"]
+    assert processor.coalesced == 1
+    assert bot.callbacks_respondidos == ["2"]
+
+
+def salvar_gold(caminho, dias_fim):
+    hoje = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    pd.DataFrame({
+        'numero_chamada': list(range(1, len(dias_fim) + 1)),
+        'ano_chamada': ['2026'] * len(dias_fim),
+        'link_chamada': [f"https://exemplo/{i}" for i in range(1, len(dias_fim) + 1)],
+        'dt_fim': [hoje + timedelta(days=d) for d in dias_fim],
+    }).to_parquet(caminho)
+
+
+def test_versao_do_abertos_estavel_entre_recargas(tmp_path, monkeypatch):
+    caminho = tmp_path / "gold.parquet"
+    salvar_gold(caminho, [3, 1, -2, 10, 5, 7, 2])
+    monkeypatch.setattr(bot_editais, "DATAFILE", str(caminho))
+    monkeypatch.setattr(bot_editais, "df_cache", None)
+    monkeypatch.setattr(bot_editais, "abertos_pages_cache", {'version': None, 'pages': []})
+
+    versao, paginas = bot_editais.get_abertos_pages()
+    assert [len(p) for p in paginas] == [5, 1] # 6 abertos, 5 por página
+    assert [linha[0] for linha in paginas[0]] == ['2', '7', '1', '5', '6'] # prazo mais próximo primeiro
+
+    # Cache expirado com o arquivo intacto: recarrega, mas a versão e as páginas continuam as mesmas
+    monkeypatch.setattr(bot_editais, "last_load_time", 0)
+    versao_recarga, paginas_recarga = bot_editais.get_abertos_pages()
+    assert versao_recarga == versao
+    assert paginas_recarga is paginas
+
+    texto, teclado = bot_editais.render_abertos_page(versao, paginas, 1)
+    assert texto.startswith("*Editais Abertos* (página 2/2)")
+    assert [b.callback_data for b in teclado.inline_keyboard[0]] == [f"abertos:{versao}:0"]
+
+    salvar_gold(caminho, [3, 1])
+    monkeypatch.setattr(bot_editais, "last_load_time", 0)
+    assert bot_editais.get_abertos_pages()[0] != versao
+
+
+class AppFalsa:
+    def __init__(self):
+        self.bot = self
+        self.enviadas = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.enviadas.append((chat_id, text))
+
+
+def test_edital_encerrado_desconhecido_e_registrado_sem_alerta(tmp_path, monkeypatch):
+    caminho = tmp_path / "gold.parquet"
+    salvar_gold(caminho, [-400, 5]) # 1/2026 encerrado (ex: recuperado por backfill), 2/2026 aberto
+    monkeypatch.setattr(bot_editais, "DATAFILE", str(caminho))
+    monkeypatch.setattr(bot_editais, "df_cache", None)
+    monkeypatch.setattr(bot_editais, "ALERTED_EDITAIS_DB", str(tmp_path / "alertados.json"))
+    registry = UserRegistry()
+    registry.set_active(7, True)
+    monkeypatch.setattr(bot_editais, "user_registry", registry)
+    app = AppFalsa()
+
+    assert asyncio.run(bot_editais.verificar_novos_editais(app)) == 1
+    assert len(app.enviadas) == 1 and "2/2026" in app.enviadas[0][1] and "1/2026" not in app.enviadas[0][1]
+    alertados = {(e['numero_chamada'], e['ano_chamada']) for e in bot_editais.load_alerted_editais()}
+    assert alertados == {('1', '2026'), ('2', '2026')}
@@ -0,0 +1,53 @@
+import json
+
+import numpy as np
+import pytest
+
+import registro_usuarios
+from registro_usuarios import UserRegistry, load_registry
+
+
+def test_alternar_inserir_e_iterar(monkeypatch):
+    monkeypatch.setattr(registro_usuarios, "MERGE_THRESHOLD", 3)
+    registry = UserRegistry.from_arrays([30, 10, 20, 10], [True, True, False, False])
+
+    assert len(registry) == 3
+    assert not registry.is_active(10) # Última ocorrência prevalece
+    assert registry.set_active(20, True) is False
+    assert registry.set_active(99, True) is None
+    assert 99 in registry and 5 not in registry
+
+    for chat_id in (1, 2, 3): # Estoura o buffer e força a incorporação aos arrays
+        registry.set_active(chat_id, chat_id != 2)
+    assert registry.active_count() == 5
+    ativos = np.concatenate(list(registry.iter_active_chunks(chunk_size=8)))
+    assert ativos.tolist() == [1, 3, 20, 30, 99]
+
+
+def test_snapshot_ida_e_volta(tmp_path):
+    caminho = tmp_path / "usuarios.bin"
+    registry = UserRegistry.from_dict({"7": True, "3": False, "11": True})
+    registry.set_active(5, True)
+    registry.save(caminho)
+
+    carregado = load_registry(caminho)
+    assert len(carregado) == 4
+    assert [carregado.is_active(c) for c in (3, 5, 7, 11)] == [False, True, True, True]
+
+
+def test_migra_json_antigo(tmp_path):
+    legado = tmp_path / "usuarios_bot.json"
+    legado.write_text(json.dumps({"1": True, "2": False}), encoding="utf-8")
+
+    registry = load_registry(tmp_path / "usuarios.bin", legado)
+    assert registry.active_count() == 1
+
+
+@pytest.mark.parametrize("conteudo", [b"", b"XXXX" + b"\0" * 12, b"EDUR\1\0\0\0\x05\0\0\0\0\0\0\0"])
+def test_snapshot_ilegivel_nao_vira_registro_vazio(tmp_path, conteudo):
+    caminho = tmp_path / "usuarios.bin"
+    caminho.write_bytes(conteudo)
+
+    with pytest.raises(ValueError):
+        load_registry(caminho)
+    assert caminho.read_bytes() == conteudo
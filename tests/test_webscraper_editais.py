@@ -0,0 +1,133 @@
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+import pytest
+import requests
+
+import webscraper_editais
+from webscraper_editais import BRONZE_COLUMNS, Fonte, extrair_numero_ano, parse_ipea_bolsas, parsear_fixture
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def carregar(nome):
+    return (FIXTURES / nome).read_text(encoding="utf-8")
+
+
+@pytest.mark.parametrize("titulo, esperado", [
+    ("Chamada Pública nº 12/2024 - PNPD", ("12", "2024")),
+    ("Chamada Pública 7/2025 – Bolsas", ("7", "2025")),
+    ("Seleção de bolsistas 3/2023", ("3", "2023")),
+    ("Seleção de bolsistas", (None, None)),
+    (None, (None, None)),
+])
+def test_extrair_numero_ano(titulo, esperado):
+    assert extrair_numero_ano(titulo) == esperado
+
+
+def test_parse_resultado_busca_ajax():
+    registros = parse_ipea_bolsas(carregar("ipea_bolsas_resultado_busca_ajax.html"))
+
+    assert registros == [
+        {
+            'numero_chamada': '12',
+            'ano_chamada': '2024',
+            'link_chamada': 'https://www.ipea.gov.br/portal/bolsas-de-pesquisa/chamada-publica-12-2024',
+            'programa': 'PNPD',
+            'periodo_inscricao': '01/03/2024 à 15/03/2024',
+        },
+        {
+            'numero_chamada': '7',
+            'ano_chamada': '2025',
+            'link_chamada': 'https://www.ipea.gov.br/portal/bolsas-de-pesquisa/chamada-7-2025',
+            'programa': 'PIBIC',
+            'periodo_inscricao': '10/02/2025 à 28/02/2025',
+        },
+        {
+            'numero_chamada': '3',
+            'ano_chamada': '2023',
+            'link_chamada': 'https://www.ipea.gov.br/portal/bolsas-de-pesquisa/selecao-3-2023',
+            'programa': 'PROMOB',
+            'periodo_inscricao': '05/06/2023 à 20/06/2023',
+        },
+        {
+            # Sem número no título: o ano vem do campo <strong>Ano:</strong>
+            'numero_chamada': None,
+            'ano_chamada': '2022',
+            'link_chamada': 'https://www.ipea.gov.br/portal/bolsas-de-pesquisa/selecao-sem-numero',
+            'programa': 'PNPD',
+            'periodo_inscricao': None,
+        },
+    ]
+
+
+def test_parse_lista_antiga():
+    registros = parse_ipea_bolsas(carregar("ipea_bolsas_lista_antiga.html"))
+
+    assert [(r['numero_chamada'], r['ano_chamada']) for r in registros] == [('40', '2021'), ('41', '2021')]
+    # Primeiro item usa <div> em vez de <p> para os detalhes
+    assert registros[0]['programa'] == 'PNPD'
+    assert registros[0]['periodo_inscricao'] == '02/08/2021 à 16/08/2021'
+    assert registros[1]['programa'] == 'PIBIC'
+    assert registros[1]['link_chamada'] == 'https://www.ipea.gov.br/portal/bolsas-de-pesquisa/chamada-publica-41-2021'
+
+
+def test_parse_sem_container():
+    assert parse_ipea_bolsas("<html><body><p>Página em manutenção</p></body></html>") == []
+
+
+def test_parsear_fixture_esquema_bronze():
+    df = parsear_fixture("ipea_bolsas", FIXTURES / "ipea_bolsas_resultado_busca_ajax.html")
+
+    assert list(df.columns) == BRONZE_COLUMNS
+    assert len(df) == 4
+    assert (df['fonte'] == "ipea_bolsas").all()
+
+
+def test_coletar_fontes_descarta_fonte_lenta_e_com_erro(monkeypatch):
+    rapida = Fonte("rapida", "https://rapida", parse_ipea_bolsas, timeout=0.5)
+    lenta = Fonte("lenta", "https://lenta", parse_ipea_bolsas, timeout=0.3)
+    quebrada = Fonte("quebrada", "https://quebrada", parse_ipea_bolsas, timeout=0.5)
+    liberar_lenta = threading.Event()
+
+    def coletar_fonte(fonte):
+        if fonte is lenta:
+            liberar_lenta.wait(5) # Presa além do prazo
+        if fonte is quebrada:
+            raise requests.exceptions.ConnectionError("conexão recusada")
+        return webscraper_editais.parsear_fonte(fonte, carregar("ipea_bolsas_resultado_busca_ajax.html"))
+
+    monkeypatch.setattr(webscraper_editais, "coletar_fonte", coletar_fonte)
+    inicio = time.monotonic()
+    try:
+        df = webscraper_editais.coletar_fontes([lenta, rapida, quebrada])
+    finally:
+        liberar_lenta.set()
+    decorrido = time.monotonic() - inicio
+
+    # Fontes coletadas em paralelo: o ciclo dura o maior timeout, não a soma deles
+    assert decorrido < 0.5 + 0.3
+    assert set(df['fonte']) == {"rapida"}
+    # A linha sem número de chamada é descartada pela validação da fonte
+    assert df['numero_chamada'].tolist() == [12, 7, 3]
+
+
+def test_run_mescla_coleta_com_historico_da_bronze(tmp_path, monkeypatch):
+    monkeypatch.setattr(webscraper_editais, "output_path", tmp_path / "bronze.parquet")
+    primeira = webscraper_editais.validar_registros(
+        parsear_fixture("ipea_bolsas", FIXTURES / "ipea_bolsas_resultado_busca_ajax.html"), "ipea_bolsas")
+    segunda = webscraper_editais.validar_registros(
+        parsear_fixture("ipea_bolsas", FIXTURES / "ipea_bolsas_lista_antiga.html"), "ipea_bolsas")
+    segunda = pd.concat([segunda, primeira[primeira['numero_chamada'] == 7].assign(programa="PIBIC 2")])
+
+    for coleta in (primeira, segunda):
+        monkeypatch.setattr(webscraper_editais, "coletar_fontes", lambda fontes, coleta=coleta: coleta.copy())
+        webscraper_editais.run()
+
+    bronze = pd.read_parquet(tmp_path / "bronze.parquet")
+    assert list(zip(bronze['ano_chamada'], bronze['numero_chamada'])) == [
+        ('2021', 40), ('2021', 41), ('2023', 3), ('2024', 12), ('2025', 7)]
+    # A coleta mais recente prevalece sobre o histórico
+    assert bronze.set_index('numero_chamada').loc[7, 'programa'] == "PIBIC 2"